@@ -1,4 +1,8 @@
 import streamlit as st
+from Stock_Warmup import start_warmup
+
+# preload the watchlist in the background (only if STOCK_WARMUP is set), once per server
+start_warmup()
 
 
 st.title('Welcome to my ENGR13300 Final Project')
@@ -0,0 +1,223 @@
+# headless batch run of the Performance & Volatility and Compare numbers over a whole
+# ticker universe, for nightly jobs. no streamlit and no figures, only the compute halves.
+#
+#   python Stock_Batch.py --universe tickers.txt --out nightly/ --workers 8
+#   python Stock_Batch.py AAPL MSFT NVDA --out nightly/ --format csv --windows 30 90
+#   python Stock_Batch.py --universe tickers.txt --out nightly/ --resume
+#
+# results land in out/summary/ (one row per ticker) and out/annual/ (one row per ticker and
+# year) as one part file per chunk, written as soon as the chunk finishes. read them back with
+# pd.read_parquet('nightly/summary') or by concatenating the csv parts.
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from Stock_Functions import get_history, get_max_daily, annual_returns, VolatilityEngine, compare_returns
+from Stock_Providers import set_provider
+
+
+def read_universe(path: str):
+    '''
+    tickers from a text file: one per line or comma separated, '#' starts a comment
+    '''
+    tickers = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            tickers += [t.strip().upper() for t in line.split(',') if t.strip()]
+    return list(dict.fromkeys(tickers))
+
+
+def ticker_analytics(symbol: str, benchmark: str, windows, period: str, interval: str):
+    '''
+    the numbers for one ticker, the same ones the pages show:
+    - annual returns (annual_performance)
+    - latest annualized vol for each window (historical_volatility)
+    - % return, the benchmark's % return and their correlation over period (stock_compare)
+
+    returns:
+    (summary dict, list of annual rows). raises if the ticker has no data
+    '''
+    df_max = get_max_daily(symbol)
+    if df_max.empty:
+        raise ValueError("no data")
+
+    engine = VolatilityEngine(df_max['Close'])
+    summary = {
+        'ticker': symbol,
+        'last_date': df_max.index[-1].date().isoformat(),
+        'last_close': float(df_max['Close'].iloc[-1]),
+        'n_days': len(df_max),
+    }
+    for window in windows:
+        summary[f'hv_{window}d'] = engine.latest(window)
+
+    df_rel = get_history(symbol, period=period, interval=interval)
+    df_bench = get_history(benchmark, period=period, interval=interval)
+    _, ret, ret_bench, corr = compare_returns(df_rel, df_bench, symbol, benchmark)
+    summary.update({
+        'return_pct': float(ret),
+        'benchmark_return_pct': float(ret_bench),
+        'excess_return_pct': float(ret - ret_bench),
+        'corr_benchmark': float(corr),
+    })
+
+    annual = [{'ticker': symbol, 'year': int(year), 'return_pct': float(value)}
+              for year, value in annual_returns(df_max).items()]
+    return summary, annual
+
+
+def run_chunk(tickers, benchmark: str, windows, period: str, interval: str):
+    '''
+    runs ticker_analytics over a chunk inside a worker process. a ticker that fails is
+    reported back instead of stopping the rest of the chunk.
+
+    returns:
+    (summary rows, annual rows, {ticker: error message})
+    '''
+    summaries, annual, failed = [], [], {}
+    for symbol in tickers:
+        try:
+            summary, rows = ticker_analytics(symbol, benchmark, windows, period, interval)
+            summaries.append(summary)
+            annual += rows
+        except Exception as e:
+            failed[symbol] = f"{type(e).__name__}: {e}"
+    return summaries, annual, failed
+
+
+def _init_worker(rate: float, burst: int):
+    # each process builds its own provider (a forked worker would otherwise inherit the parent's),
+    # with its share of the upstream rate limit and burst, so all of them starting at once still
+    # only fire one burst's worth of requests
+    os.environ["STOCK_RATE_LIMIT"] = str(rate)
+    os.environ["STOCK_RATE_BURST"] = str(burst)
+    set_provider(None)
+
+
+def _write_part(df, path: str, fmt: str):
+    # temp file + rename so an interrupted run never leaves half a part behind
+    tmp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def finished_tickers(out_dir: str, fmt: str):
+    '''
+    tickers that already have a summary row in out_dir. annual parts without a matching
+    summary part (the run died between the two writes) are deleted so they aren't doubled up.
+    '''
+    summary_parts = glob.glob(os.path.join(out_dir, 'summary', f'*.{fmt}'))
+    summary_names = {os.path.basename(p) for p in summary_parts}
+    for path in glob.glob(os.path.join(out_dir, 'annual', f'*.{fmt}')):
+        if os.path.basename(path) not in summary_names:
+            os.remove(path)
+
+    done = set()
+    for path in summary_parts:
+        df = pd.read_parquet(path, columns=['ticker']) if fmt == 'parquet' else pd.read_csv(path, usecols=['ticker'])
+        done.update(df['ticker'])
+    return done
+
+
+def run_batch(tickers, out_dir: str, benchmark: str = 'SPY', windows=(30,), period: str = '1y', interval: str = '1d',
+              workers: int = None, chunk_size: int = 25, fmt: str = 'parquet', resume: bool = False):
+    '''
+    runs the analytics for every ticker on a process pool, chunk_size tickers per job, and
+    writes each chunk's results to out_dir as soon as it's done.
+
+    with resume, tickers that already have results in out_dir are skipped, so a run that
+    crashed or had failures can just be started again. failures of the latest run are
+    listed in out_dir/failed.csv.
+
+    returns:
+    {ticker: error message} for the tickers that failed
+    '''
+    workers = workers or os.cpu_count() or 1
+    for sub in ('summary', 'annual'):
+        os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+
+    if resume:
+        done = finished_tickers(out_dir, fmt)
+        tickers = [t for t in tickers if t not in done]
+        print(f"resuming: {len(done)} tickers already done, {len(tickers)} to go")
+    if not tickers:
+        return {}
+
+    # fetch the benchmark once up front, so the workers all read it from the store instead of
+    # each downloading it
+    get_max_daily(benchmark)
+
+    chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    run_id = time.strftime("%Y%m%d-%H%M%S")
+    rate = float(os.environ.get("STOCK_RATE_LIMIT", 5)) / workers
+    burst = max(1, int(os.environ.get("STOCK_RATE_BURST", 50)) // workers)
+
+    failed = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rate, burst)) as pool:
+        futures = {pool.submit(run_chunk, chunk, benchmark, list(windows), period, interval): i for i, chunk in enumerate(chunks)}
+
+        for n, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                summaries, annual, chunk_failed = future.result()
+            except Exception as e:
+                # the worker itself died, every ticker in the chunk counts as failed
+                summaries, annual, chunk_failed = [], [], {t: f"{type(e).__name__}: {e}" for t in chunks[i]}
+
+            name = f"part-{run_id}-{i:05d}.{fmt}"
+            if annual:
+                _write_part(pd.DataFrame(annual), os.path.join(out_dir, 'annual', name), fmt)
+            if summaries:
+                # written last: a summary part is what marks its tickers as done for --resume
+                _write_part(pd.DataFrame(summaries), os.path.join(out_dir, 'summary', name), fmt)
+
+            failed.update(chunk_failed)
+            print(f"chunk {n}/{len(chunks)}: {len(summaries)} ok, {len(chunk_failed)} failed ({time.perf_counter() - start:.1f}s)")
+
+    pd.DataFrame({'ticker': list(failed), 'error': list(failed.values())}).to_csv(os.path.join(out_dir, 'failed.csv'), index=False)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch annual return / volatility / benchmark analytics over a ticker universe")
+    parser.add_argument("tickers", nargs="*", help="tickers to run (or use --universe)")
+    parser.add_argument("--universe", help="text file of tickers, one per line or comma separated")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--benchmark", default="SPY")
+    parser.add_argument("--windows", type=int, nargs="+", default=[30], help="volatility windows in days")
+    parser.add_argument("--period", default="1y", help="period the benchmark comparison covers")
+    parser.add_argument("--interval", default="1d", help="interval the benchmark comparison uses")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=25, help="tickers per job")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--resume", action="store_true", help="skip tickers that already have results in --out")
+    args = parser.parse_args()
+
+    tickers = [t.upper() for t in args.tickers]
+    if args.universe:
+        tickers += read_universe(args.universe)
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        parser.error("no tickers given")
+
+    failed = run_batch(
+        tickers, args.out, benchmark=args.benchmark.upper(), windows=args.windows, period=args.period,
+        interval=args.interval, workers=args.workers, chunk_size=args.chunk_size, fmt=args.format, resume=args.resume,
+    )
+    if failed:
+        print(f"{len(failed)} tickers failed, see {os.path.join(args.out, 'failed.csv')}. rerun with --resume to retry them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
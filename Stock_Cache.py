@@ -0,0 +1,262 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+# regular US trading session. holidays aren't tracked, on those days the policy just refreshes once too often
+MARKET_TZ = 'America/New_York'
+MARKET_OPEN = pd.Timedelta(hours=9, minutes=30)
+MARKET_CLOSE = pd.Timedelta(hours=16)
+
+# yahoo's final bars for the day settle a little after the close
+CLOSE_GRACE = pd.Timedelta(minutes=15)
+
+# how long intraday data stays fresh while the market is open (seconds)
+INTRADAY_TTL = {'1m': 60, '1h': 15 * 60}
+
+
+def _trading_day(day) -> bool:
+    return day.weekday() < 5
+
+
+def expires_at(interval: str, fetched_at: float = None) -> float:
+    '''
+    market-hours-aware freshness: when data fetched at fetched_at (epoch seconds, default now)
+    should be refetched.
+
+    - intraday (1m, 1h): after INTRADAY_TTL while the market is open, otherwise at the next open
+    - daily and longer (and info): shortly after the next close
+    - nothing expires over the weekend
+
+    returns:
+    epoch seconds
+    '''
+    # worked out on new york wall clock time (naive) and only localized at the end, so stepping
+    # a day over a DST change is still one calendar day and not 23/25 hours
+    now = pd.Timestamp(time.time() if fetched_at is None else fetched_at, unit='s', tz='UTC').tz_convert(MARKET_TZ).tz_localize(None)
+    today = now.normalize()
+
+    def epoch(wall_time):
+        return wall_time.tz_localize(MARKET_TZ).timestamp()
+
+    if interval in INTRADAY_TTL:
+        session_end = today + MARKET_CLOSE + CLOSE_GRACE
+        if _trading_day(today) and today + MARKET_OPEN <= now < session_end:
+            return epoch(min(now + pd.Timedelta(seconds=INTRADAY_TTL[interval]), session_end))
+
+        # market is shut, nothing new until the next open
+        day = today if now < today + MARKET_OPEN else today + pd.Timedelta(days=1)
+        while not _trading_day(day):
+            day += pd.Timedelta(days=1)
+        return epoch(day + MARKET_OPEN)
+
+    day = today if now < today + MARKET_CLOSE + CLOSE_GRACE else today + pd.Timedelta(days=1)
+    while not _trading_day(day):
+        day += pd.Timedelta(days=1)
+    return epoch(day + MARKET_CLOSE + CLOSE_GRACE)
+
+
+def estimate_nbytes(value) -> int:
+    '''
+    rough memory size of a cached value. frames and arrays are counted exactly, anything
+    else (info dicts...) is approximated.
+    '''
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum()) if isinstance(value, pd.DataFrame) else int(usage)
+    if isinstance(value, np.ndarray) or hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+
+    return sys.getsizeof(value)
+
+
+class SingleFlight:
+    '''
+    makes sure only one call per key is running at a time. the first caller for a key does
+    the work, anyone asking for the same key meanwhile just waits for that result (or error)
+    instead of starting their own. stops a popular ticker expiring from turning into a
+    stampede of identical downloads.
+    '''
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+class LRUCache:
+    '''
+    thread safe least-recently-used cache, capped on both the number of entries and their
+    total size. when either cap is hit the least recently used entries are evicted first.
+    entries can also carry an expiry time, after which they count as a miss, and can be
+    pinned (reference counted) so they are never evicted while something still uses them.
+
+    inputs:
+    max_entries: most entries kept at once
+    max_bytes: most total size kept at once (None for no size cap)
+    sizeof: function giving the size of a value in bytes. defaults to len()
+    '''
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def _drop(self, key):
+        # caller holds the lock
+        _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, _, expiry = entry
+            if expiry is not None and expiry <= time.time():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, expires_at: float = None):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # would evict everything else and still not fit
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self.nbytes += size
+
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                # least recently used entry that nobody has pinned
+                victim = next((k for k in self._entries if k not in self._pins), None)
+                if victim is None:
+                    break
+                self._drop(victim)
+                self.evictions += 1
+
+    def pin(self, key):
+        '''
+        adds a reference to key. pinned entries are skipped by eviction (they still expire)
+        '''
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key):
+        '''
+        drops a reference added by pin. the entry becomes evictable once nothing references it
+        '''
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def get_or_load(self, key, loader, expiry=None):
+        '''
+        cached value for key, or loader() if it is missing/expired. concurrent misses on the
+        same key share one loader() call.
+
+        inputs:
+        loader: no-argument function producing the value
+        expiry: optional no-argument function giving the new entry's expiry (epoch seconds).
+                it runs after loader so slow loads don't eat into the entry's lifetime
+        '''
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        def load():
+            # someone may have filled it while we were queued up behind them
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and (entry[2] is None or entry[2] > time.time()):
+                return entry[0]
+
+            value = loader()
+            self.put(key, value, expires_at=expiry() if expiry is not None else None)
+            return value
+
+        return self._flight.do(key, load)
+
+    def stats(self) -> dict:
+        '''
+        hit/miss/eviction counters plus the current size, for monitoring
+        '''
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'pinned': len(self._pins),
+                'coalesced': self._flight.shared,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
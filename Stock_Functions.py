@@ -1,34 +1,409 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import mplfinance as mpf
-from matplotlib.ticker import FuncFormatter 
-import yfinance as yf
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import time
+import weakref
+
+from Stock_Store import load_history, save_history, merge_bars, history_rebased
+from Stock_Cache import LRUCache, expires_at, estimate_nbytes
+from Stock_Providers import get_provider
+from Stock_Metrics import span, timed
+
+# matplotlib, mplfinance and yfinance take longer to import than the rest of the app put together,
+# so they're only imported inside the functions that draw (or download) something. the first
+# chart pays for the import once, pages that never draw never do (see preload_plotting)
+
+# rendered charts as PNG bytes, shared by every session. capped at 256 charts / 128MB
+RENDER_CACHE = LRUCache(max_entries=256, max_bytes=128 * 1024 * 1024)
+
+# charts end up about this many pixels wide on screen, so drawing more points than that is wasted work.
+# candles need ~3px to show a body and wick, volume bars ~2px, a line can use every pixel
+PLOT_WIDTH_PX = 1200
+MAX_CANDLES = PLOT_WIDTH_PX // 3
+MAX_VOLUME_BARS = PLOT_WIDTH_PX // 2
+MAX_LINE_POINTS = PLOT_WIDTH_PX
+
+# downloaded data (histories, info, volatility engines), shared by every session. memory capped
+# (STOCK_CACHE_MB, default 512MB) and entries expire with the trading session (Stock_Cache.expires_at)
+DATA_CACHE = LRUCache(
+    max_entries=1024,
+    max_bytes=int(os.environ.get("STOCK_CACHE_MB", 512)) * 1024 * 1024,
+    sizeof=estimate_nbytes,
+)
+
+# yahoo only serves intraday bars this far back, older stores need a full refetch
+INTRADAY_LIMIT = {'1m': pd.Timedelta(days=7), '1h': pd.Timedelta(days=730)}
+
+# calendar lengths of yahoo's period strings so they can be cut out of a stored history
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1wk': pd.DateOffset(weeks=1),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+# intervals that get built locally out of the daily history instead of downloaded
+RESAMPLE_RULES = {'1wk': 'W-MON', '1mo': 'MS'}
+
+# how each column is rolled up when daily bars become weekly/monthly ones
+OHLCV_AGG = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+    'Dividends': 'sum',
+    'Stock Splits': 'max',
+}
+
+
+# bars per year for each interval, to annualize per-bar statistics (390 one minute / 7 hourly bars a session)
+PERIODS_PER_YEAR = {'1m': 252 * 390, '1h': 252 * 7, '1d': 252, '1wk': 52, '1mo': 12}
+
+# default rolling window (in bars) for the compare page's rolling correlation/beta, about 3 months of daily bars
+ROLLING_WINDOWS = {'1m': 60, '1h': 35, '1d': 60, '1wk': 26, '1mo': 12}
+
+# columns nothing downstream reads, dropped from the shared frames to save memory
+UNUSED_COLUMNS = ['Dividends', 'Stock Splits', 'Capital Gains']
+
+# most download threads fetch_many starts at once. the rate limiter does the throttling, this only
+# stops a huge universe from starting thousands of threads
+FETCH_MAX_WORKERS = int(os.environ.get("STOCK_FETCH_WORKERS", 128))
+
+# store shared frames as float32 prices / uint32 volume. STOCK_COMPACT_FRAMES=0 keeps yahoo's dtypes
+COMPACT_FRAMES = os.environ.get("STOCK_COMPACT_FRAMES", "1") != "0"
+
+
+def _load_bars(symbol: str, interval: str):
+    '''
+    returns the full stored history for a ticker/interval, refreshing it first if it is stale.
+    a refresh only downloads the bars from the last stored timestamp onwards and appends them,
+    unless a split/dividend re-adjusted the history upstream (see history_rebased). then the
+    stored bars are on the old price basis, so the whole history is downloaded again and
+    replaces them.
+    '''
+    with span('fetch.store_read', ticker=symbol, interval=interval):
+        df_stored, age = load_history(symbol, interval)
+    if df_stored is not None and expires_at(interval, time.time() - age) > time.time():
+        return df_stored
+
+    # the provider (Stock_Providers.py) coalesces identical requests, rate limits and retries
+    provider = get_provider()
+    try:
+        with span('fetch.upstream', ticker=symbol, interval=interval):
+            df_new = _fetch_new_bars(provider, symbol, interval, df_stored)
+        if history_rebased(df_stored, df_new):
+            with span('fetch.upstream', ticker=symbol, interval=interval):
+                df_full = provider.history(symbol, interval=interval, period='max')
+            if not df_full.empty:
+                df_new, df_stored = df_full, None
+    except Exception:
+        # stale data beats no data if yahoo is down
+        if df_stored is None:
+            raise
+        return df_stored
+
+    if df_new.empty:
+        return df_stored if df_stored is not None else pd.DataFrame()
+
+    df_merged = merge_bars(df_stored, df_new)
+    with span('fetch.store_write', ticker=symbol, interval=interval):
+        save_history(symbol, interval, df_merged)
+    return df_merged
+
+
+def _fetch_new_bars(provider, symbol: str, interval: str, df_stored):
+    '''
+    asks the provider for whatever df_stored is missing (everything if there is no store)
+    '''
+    if df_stored is None or df_stored.empty:
+        return provider.history(symbol, interval=interval, period='max')
+    elif interval in INTRADAY_LIMIT and pd.Timestamp.now(tz=df_stored.index.tz) - df_stored.index[-1] > INTRADAY_LIMIT[interval]:
+        # too old for yahoo to fill the gap, take everything it still has
+        return provider.history(symbol, interval=interval, period='max')
+    else:
+        # the last stored bar is fetched again since it may have been partial
+        return provider.history(symbol, interval=interval, start=df_stored.index[-1])
+
+
+def _slice_period(df, period: str):
+    '''
+    cuts a yahoo style period ('1mo', 'YTD', 'max', ...) off the end of a history.
+    periods are counted back from the last bar, not from today.
+    '''
+    if df.empty or period.lower() == 'max':
+        return df
+
+    last_day = df.index[-1].normalize()
+    if period.lower() == 'ytd':
+        start = last_day.replace(month=1, day=1)
+    elif period in PERIOD_OFFSETS:
+        start = last_day - PERIOD_OFFSETS[period] + pd.Timedelta(days=1)
+    else:
+        raise ValueError(f"Unsupported period '{period}'")
+
+    return df.iloc[df.index.searchsorted(start):]
+
+
+def _as_bound(when, tz):
+    # a start/end as a Timestamp in the index's timezone. naive ones are taken to already be in it
+    when = pd.Timestamp(when)
+    if tz is not None and when.tzinfo is None:
+        return when.tz_localize(tz)
+    if tz is None and when.tzinfo is not None:
+        return when.tz_localize(None)
+    return when
+
+
+def slice_range(df, start=None, end=None):
+    '''
+    the bars of df from start through end (both included), found by binary search
+    (searchsorted) on its sorted index. costs O(log n) whatever the range, and hands back a
+    view of df's arrays rather than a copy.
+
+    inputs:
+    df: frame or series with a sorted DatetimeIndex (any cached history)
+    start, end: anything pd.Timestamp takes ('2024-03-01', a date, a Timestamp) or None for
+                an open end. naive values are read in the index's timezone. an end at
+                midnight (a plain date) covers that whole day
+    '''
+    if df.empty:
+        return df
+
+    tz = df.index.tz
+    lo = 0 if start is None else df.index.searchsorted(_as_bound(start, tz))
+    if end is None:
+        hi = len(df)
+    else:
+        end = _as_bound(end, tz)
+        if end == end.normalize():
+            hi = df.index.searchsorted(end + pd.Timedelta(days=1))
+        else:
+            hi = df.index.searchsorted(end, side='right')
+
+    return df.iloc[lo:max(lo, hi)]
+
+
+def resample_ohlcv(df_daily, interval: str):
+    '''
+    turns daily bars into weekly ('1wk') or monthly ('1mo') bars the same way yahoo labels
+    them (weeks start monday, months start on the 1st). '1d' just hands the frame back.
+
+    inputs:
+    df_daily: daily OHLCV DataFrame
+    interval: '1d', '1wk' or '1mo'
+    '''
+    if interval == '1d' or df_daily.empty:
+        return df_daily
+
+    rule = RESAMPLE_RULES[interval]
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in df_daily.columns}
+    df = df_daily.resample(rule, label='left', closed='left').agg(agg)
+
+    # weeks/months with no trading (holidays, gaps in old data) come out as all NaN rows
+    return df.dropna(subset=['Close'])
+
+
+def compact_frame(df, compact: bool = COMPACT_FRAMES):
+    '''
+    turns a history into the read-only frame every session shares out of DATA_CACHE.
+    the arrays behind it are marked read-only so an in-place edit raises instead of
+    changing another user's data. with compact on, prices become float32, volume uint32
+    (int64 if it doesn't fit) and the unused Dividends/Stock Splits columns are dropped,
+    which roughly halves the memory of a frame.
+    '''
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if compact and col in UNUSED_COLUMNS:
+            continue
+        elif compact and col in ('Open', 'High', 'Low', 'Close'):
+            values = values.astype(np.float32)
+        elif compact and col == 'Volume':
+            values = np.nan_to_num(values)
+            fits = len(values) == 0 or (values.min() >= 0 and values.max() < 2**32)
+            values = values.astype(np.uint32 if fits else np.int64)
+        else:
+            values = values.copy()
+
+        values.flags.writeable = False
+        columns[col] = values
+
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def get_history(symbol: str, period: str = 'max', interval: str = '1mo'):
+    '''
+    the user's selected period/interval, cut out of the stored history (df_rel).
+    this is the only download a chart render needs, and for 1d/1wk/1mo it is the
+    same daily download no matter which period or interval gets picked.
+    the frame is shared with every other session, don't modify it in place.
+    '''
+    with span('data.history', ticker=symbol, interval=interval, period=period):
+        return _slice_period(get_interval_bars(symbol, interval), period)
+
+
+def get_interval_bars(symbol: str, interval: str):
+    '''
+    full history for one interval, cached in DATA_CACHE as a shared read-only compact_frame.
+    daily and longer bars are built locally out of the daily history so only intraday
+    intervals ever go to yahoo on their own.
+    '''
+    with span('data.bars', ticker=symbol, interval=interval, cache='hit') as timer:
+        def load():
+            timer.set(cache='miss')
+            if interval in RESAMPLE_RULES:
+                return compact_frame(resample_ohlcv(get_interval_bars(symbol, '1d'), interval))
+            return compact_frame(_load_bars(symbol, interval))
+
+        return DATA_CACHE.get_or_load(('bars', symbol, interval), load, expiry=lambda: expires_at(interval))
+
+
+def get_range(symbol: str, interval: str = '1d', start=None, end=None):
+    '''
+    the bars of one ticker/interval from start through end, sliced out of the cached full
+    history with slice_range. any window (a custom date picker, another frame's span...) is
+    served from what is already cached, it only downloads if the history isn't cached yet.
+    the frame is shared with every other session, don't modify it in place.
+
+    inputs:
+    symbol: ticker
+    interval: '1m', '1h', '1d', '1wk' or '1mo'
+    start, end: see slice_range. None leaves that side open
+    '''
+    with span('data.range', ticker=symbol, interval=interval):
+        return slice_range(get_interval_bars(symbol, interval), start, end)
+
+
+def read_history(symbol: str, period: str = 'max', interval: str = '1d'):
+    '''
+    period of a ticker's history straight out of the on-disk store (refreshed first if it's
+    stale), without putting the full history in DATA_CACHE. for bulk jobs like the screener
+    that read thousands of tickers once and would otherwise push out everything other sessions
+    have cached. a history that is already cached is used as is.
+    '''
+    with span('data.history', ticker=symbol, interval=interval, period=period):
+        df = DATA_CACHE.get(('bars', symbol, interval))
+        if df is None:
+            if interval in RESAMPLE_RULES:
+                df = resample_ohlcv(_load_bars(symbol, '1d'), interval)
+            else:
+                df = _load_bars(symbol, interval)
+        return _slice_period(df, period)
+
+
+def get_max_daily(symbol: str):
+    '''
+    the max history, always daily ('1d') for annual performance and volatility (df_max)
+    '''
+    return get_interval_bars(symbol, '1d')
+
+
+def get_info(symbol: str):
+    '''
+    yahoo's info dict for a ticker. this is its own request so only pages that show it pay for it
+    '''
+    with span('data.info', ticker=symbol, cache='hit') as timer:
+        def load():
+            timer.set(cache='miss')
+            return get_provider().info(symbol)
+
+        return DATA_CACHE.get_or_load(('info', symbol), load, expiry=lambda: expires_at('1d'))
+
+
+class FrameRef:
+    '''
+    what a session keeps instead of its own DataFrame: just (symbol, interval, period).
+    the frame itself lives once in DATA_CACHE and every session looking at the same ticker
+    resolves to the same object.
+
+    while a FrameRef is alive its history is pinned in DATA_CACHE so it won't be evicted
+    out from under the session. the pin is released by itself once the FrameRef is garbage
+    collected (replaced by a new ticker, or the session ending).
+    '''
+
+    def __init__(self, symbol: str, interval: str, period: str):
+        self.symbol = symbol.upper()
+        self.interval = interval
+        self.period = period
+
+        cache_key = ('bars', self.symbol, interval)
+        DATA_CACHE.pin(cache_key)
+        weakref.finalize(self, DATA_CACHE.unpin, cache_key)
+
+    @property
+    def key(self):
+        return (self.symbol, self.interval, self.period)
+
+    def resolve(self):
+        '''
+        the shared (read-only) df_rel for this key
+        '''
+        return get_history(self.symbol, period=self.period, interval=self.interval)
+
+
+def cache_stats():
+    '''
+    hit/miss/eviction counters and sizes of the data and chart caches
+    '''
+    return {'data': DATA_CACHE.stats(), 'render': RENDER_CACHE.stats()}
+
+
+class StockHandle:
+    '''
+    lazy handle on one ticker. nothing gets downloaded until a piece of data is asked for,
+    and each piece (history, max_daily, info) is cached on its own.
+
+    example:
+    stock = StockHandle('AAPL')
+    df_rel = stock.history(period='YTD', interval='1d')   # one request
+    df_max = stock.max_daily                              # only fetched here
+    '''
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol.upper()
+
+    def history(self, period: str = 'max', interval: str = '1mo'):
+        return get_history(self.symbol, period=period, interval=interval)
+
+    def range(self, interval: str = '1d', start=None, end=None):
+        return get_range(self.symbol, interval=interval, start=start, end=end)
+
+    @cached_property
+    def max_daily(self):
+        return get_max_daily(self.symbol)
+
+    @cached_property
+    def info(self):
+        return get_info(self.symbol)
+
 
-@st.cache_data
 def get_stock_data(symbol: str, period: str = 'max', interval: str = '1mo'):
     """
     Fetches and caches stock data from Yahoo Finance based on a period and interval.
+    Histories come out of the on-disk store (Stock_Store.py) first, so yahoo only gets
+    asked for bars we have not seen yet.
+
+    Kept for callers that want everything at once. New code should use StockHandle
+    (or get_history/get_max_daily/get_info) and only load what it needs.
 
     Returns:
     (df_rel, df_max, stock_info, standerd_dev, varr)
     """
 
 
-    period_for_fetch = period
-    stock = yf.Ticker(symbol)
+    stock = StockHandle(symbol)
+    df_rel = stock.history(period=period, interval=interval)
 
-    # Fetch the data specific to the user's selected period/interval (df_rel)
-    df_rel = stock.history(period=period_for_fetch, interval=interval)
-    
-    # fetch the max history, always daily ('1d') for annual performance (df_max)
-    df_max = stock.history(period='max', interval='1d')
-    
-    # fetch stock data
-    stock_info = stock.info
-
-    
     if df_rel.empty:
         # if no data is found
         return pd.DataFrame(), pd.DataFrame(), {}, 0.0, 0.0
@@ -36,50 +411,279 @@ def get_stock_data(symbol: str, period: str = 'max', interval: str = '1mo'):
     standerd_dev = np.std(df_rel['Close']) 
     varr = standerd_dev**2
 
-    return df_rel, df_max, stock_info, standerd_dev, varr
+    return df_rel, stock.max_daily, stock.info, standerd_dev, varr
     
 
-def stock_data_plot(df_rel,title: str,mav: list=[],line_type: str='candle'):
+def fetch_many(symbols, period: str = 'max', interval: str = '1d', max_workers: int = None, cache: bool = True):
+    '''
+    fetches the histories of a whole basket of tickers at once. tickers that are already
+    cached come straight back, the rest are all downloaded side by side (one thread each, up
+    to FETCH_MAX_WORKERS) so the wall time stays close to a single fetch however big the
+    basket is. the provider's token bucket (STOCK_RATE_LIMIT/STOCK_RATE_BURST) is what keeps
+    that from hammering yahoo, not the pool size.
+
+    cache=False reads each history with read_history instead of get_history, so a big
+    universe doesn't land in DATA_CACHE.
+
+    returns:
+    dict of {symbol: df}. tickers that failed or had no data map to an empty DataFrame
+    '''
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    if not symbols:
+        return {}
+
+    frames = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers or FETCH_MAX_WORKERS, len(symbols))) as pool:
+        load = get_history if cache else read_history
+        futures = {symbol: pool.submit(load, symbol, period, interval) for symbol in symbols}
+
+        for symbol, future in futures.items():
+            try:
+                frames[symbol] = future.result()
+            except Exception:
+                frames[symbol] = pd.DataFrame()
+
+    return frames
+
+
+def frame_span(df):
+    '''
+    (first, last) timestamp of a frame, the start/end to pass get_range/slice_range to get
+    the same dates out of another history. (None, None) for an empty frame (everything)
+    '''
+    if len(df) == 0:
+        return None, None
+    return df.index[0], df.index[-1]
+
+
+def frame_version(df):
+    '''
+    cheap fingerprint of a frame or series for cache keys: its length, first and last
+    timestamp and last row. new or refreshed bars change it, an unchanged history doesn't.
+    '''
+    if len(df) == 0:
+        return (0,)
+
+    last_row = np.nan_to_num(np.ravel(df.iloc[-1]).astype(float))
+    return (len(df), df.index[0], df.index[-1], *last_row.tolist())
+
+
+def preload_plotting():
+    '''
+    imports matplotlib and mplfinance ahead of the first chart (they're imported lazily,
+    see the top of this file). meant for a background thread at boot.
+    '''
+    import matplotlib.pyplot
+    import mplfinance
+
+
+def render_png(key, plot_fn, *args, **kwargs):
+    '''
+    runs one of the plotting functions below and hands back the chart as PNG bytes.
+    the bytes are cached under key (ticker, interval, period, window, frame_version...)
+    so a rerun with the same inputs skips matplotlib entirely, and the figure is always
+    closed once it has been saved (or the plot failed) so long running servers don't pile
+    up open figures.
+
+    inputs:
+    key: hashable tuple of everything the chart depends on
+    plot_fn: plotting function returning a figure (or a tuple starting with one)
+    *args, **kwargs: passed through to plot_fn
+    '''
+    with span(f'render.{plot_fn.__name__}', cache='hit') as timer:
+        png = RENDER_CACHE.get(key)
+        if png is not None:
+            return png
+
+        timer.set(cache='miss')
+        import matplotlib.pyplot as plt
+
+        open_before = set(plt.get_fignums())
+        try:
+            result = plot_fn(*args, **kwargs)
+        except Exception:
+            # a plot that fails halfway still has its figure open, close whatever it made
+            for number in set(plt.get_fignums()) - open_before:
+                plt.close(number)
+            raise
+
+        fig = result[0] if isinstance(result, tuple) else result
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+            png = buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+        RENDER_CACHE.put(key, png)
+        return png
+
+
+def decimation_buckets(n: int, max_points: int = MAX_CANDLES):
+    '''
+    positions of the first and last bar of every bucket decimate_ohlcv merges n bars into
+    (one bar per bucket when n <= max_points). anything drawn on top of the candles, like
+    indicator overlays, takes its value at the last bar so it lines up with the merged close.
+
+    returns:
+    (starts, ends) NumPy arrays
+    '''
+    bucket = max(-(-n // max_points), 1)  # ceil
+    starts = np.arange(0, n, bucket)
+    ends = np.append(starts[1:], n) - 1
+    return starts, ends
+
+
+def decimate_ohlcv(df, max_points: int = MAX_CANDLES):
+    '''
+    shrinks a long OHLCV frame to at most max_points bars before plotting by merging runs of
+    neighbouring bars into one: first open, highest high, lowest low, last close and summed
+    volume. every high and low stays on the chart, there are just fewer candles/bars to draw.
+    short frames come back untouched.
+    '''
+    if len(df) <= max_points:
+        return df
+
+    starts, ends = decimation_buckets(len(df), max_points)
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=float)
+        if col == 'Open':
+            columns[col] = values[starts]
+        elif col == 'High':
+            columns[col] = np.fmax.reduceat(values, starts)
+        elif col == 'Low':
+            columns[col] = np.fmin.reduceat(values, starts)
+        elif col == 'Close':
+            columns[col] = values[ends]
+        else:
+            # Volume, Dividends... add up over the bucket
+            columns[col] = np.add.reduceat(np.nan_to_num(values), starts)
+
+    return pd.DataFrame(columns, index=df.index[starts])
+
+
+def lttb_indices(values, max_points: int = MAX_LINE_POINTS):
+    '''
+    Largest-Triangle-Three-Buckets downsampling for line charts. picks max_points positions
+    out of values that keep the visual shape of the line (peaks and dips included).
+
+    returns:
+    NumPy array of the positions to keep, always including the first and last point
+    '''
+    n = len(values)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    y = np.nan_to_num(np.asarray(values, dtype=float))
+    x = np.arange(n, dtype=float)
+
+    # first and last point are kept, the rest is split into max_points - 2 buckets
+    edges = (np.arange(max_points - 1) * (n - 2) / (max_points - 2)).astype(int) + 1
+    edges = np.append(edges[:-1], n - 1)
+    keep = np.empty(max_points, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+
+        # point in this bucket making the biggest triangle with the last kept point and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return keep
+
+
+def decimate_line(series, max_points: int = MAX_LINE_POINTS):
+    '''
+    LTTB downsampled copy of a series for line charts. short series come back untouched.
+    '''
+    if len(series) <= max_points:
+        return series
+
+    return series.iloc[lttb_indices(series.to_numpy(), max_points)]
+
+
+def stock_data_plot(df_rel,title: str,mav: list=[],line_type: str='candle',max_points: int=None,overlays=None):
     '''
     this is the main plotting fucntion using the mplfinance library. 
     imputs: 
     pandas DataFrame 
-    moving average(s) values 
+    moving average(s) values (counted in drawn bars once the frame has been decimated)
     line type which deafults to candles 
+    max_points: most candles/points drawn. longer frames are merged down with decimate_ohlcv 
+                (or LTTB on the close for line charts). defaults to what fits in PLOT_WIDTH_PX
+    overlays: optional DataFrame of indicator columns on the same index as df_rel (see
+              Stock_Indicators.get_indicators). RSI columns get their own panel under the
+              price, everything else is drawn over it. they go through the same decimation
+              as the candles and are all handed to mplfinance in one plot call
 
     '''
-
-    if len(mav) == 0:
-        fig, axlist = mpf.plot(df_rel, type=line_type, style='yahoo', figratio=(12,6), figscale=1.5, returnfig=True)
-        axlist[0].set_title(title, fontsize=25)
-        axlist[0].set_xlabel('Date', fontsize=10)
-        axlist[0].set_ylabel('Price($)', fontsize=10)
-        for label in axlist[0].get_xticklabels():
-            label.set_fontsize(10)
-        for label in axlist[0].get_yticklabels():
-            label.set_fontsize(10)
-
-    else: # didn't end up allowing the user to add moving averages. maybe they should use a real stock app if they want those features lol. 
-        fig, axlist = mpf.plot(df_rel, mav=mav, type=line_type, style='yahoo', figratio=(50,15), figscale=6, returnfig=True)
-        axlist[0].set_title(title, fontsize=60)
-        axlist[0].set_xlabel('Date', fontsize=35)
-        axlist[0].set_ylabel('Price($)', fontsize=35)
-        for label in axlist[0].get_xticklabels():
-            label.set_fontsize(30)
-        for label in axlist[0].get_yticklabels():
-            label.set_fontsize(30)
+    import mplfinance as mpf
+
+    if line_type == 'line':
+        keep = lttb_indices(df_rel['Close'].to_numpy(), max_points or MAX_LINE_POINTS)
+        df_drawn = df_rel.iloc[keep]
+    else:
+        df_drawn = decimate_ohlcv(df_rel, max_points or MAX_CANDLES)
+        keep = decimation_buckets(len(df_rel), max_points or MAX_CANDLES)[1]
+
+    if overlays is not None:
+        overlays = overlays.iloc[keep].set_axis(df_drawn.index)
+
+    if len(mav) > 0:
+        # moving averages of the drawn bars, off the same engine as the page's overlays
+        from Stock_Indicators import IndicatorEngine
+        sma = IndicatorEngine([('sma', m) for m in mav]).update(df_drawn).frame()
+        overlays = sma if overlays is None else pd.concat([overlays, sma], axis=1)
+
+    addplot = []
+    panels = 1
+    if overlays is not None:
+        for column in overlays.columns:
+            values = overlays[column]
+            if values.isna().all():
+                # not enough bars for the window yet, nothing to draw
+                continue
+            if column.startswith('RSI'):
+                addplot.append(mpf.make_addplot(values, panel=1, color='purple', width=1, ylim=(0, 100), ylabel='RSI'))
+                addplot.append(mpf.make_addplot(pd.Series(70.0, index=values.index), panel=1, color='gray', linestyle='--', width=0.7))
+                addplot.append(mpf.make_addplot(pd.Series(30.0, index=values.index), panel=1, color='gray', linestyle='--', width=0.7))
+                panels = 2
+            elif column.startswith('BB'):
+                addplot.append(mpf.make_addplot(values, color='gray', linestyle='--' if 'Mid' in column else '-', width=0.8))
+            else:
+                addplot.append(mpf.make_addplot(values, width=1.2, label=column))
+
+    kwargs = dict(addplot=addplot, panel_ratios=(3, 1)) if panels > 1 else dict(addplot=addplot)
+    fig, axlist = mpf.plot(df_drawn, type=line_type, style='yahoo', figratio=(12,6), figscale=1.5, returnfig=True, **kwargs)
+    axlist[0].set_title(title, fontsize=25)
+    axlist[-2].set_xlabel('Date', fontsize=10)  # bottom panel (the RSI one when it's there)
+    axlist[0].set_ylabel('Price($)', fontsize=10)
+    for label in axlist[-2].get_xticklabels():
+        label.set_fontsize(10)
+    for label in axlist[0].get_yticklabels():
+        label.set_fontsize(10)
+    if any(line.get_label() and not line.get_label().startswith('_') for line in axlist[0].get_lines()):
+        axlist[0].legend(loc='upper left', fontsize=10)
 
     return fig
 
 
 
-def volume_plot(df_rel):
+def volume_plot(df_rel, max_points: int=MAX_VOLUME_BARS):
 
     '''
     this is the general volume plotting fucntion. 
 
     inputs:
     df_rel 
+    max_points: most bars drawn. longer frames are merged down with decimate_ohlcv (volume summed)
 
     outputs: 
     volume graph with: 
@@ -87,9 +691,13 @@ def volume_plot(df_rel):
     - red bars for days in which the sell volume was greater than the buy volume. 
 
     '''
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
 
 
-    colors = ['green' if c >= o else 'red' for c, o in zip(df_rel['Close'], df_rel['Open'])]
+    df_rel = decimate_ohlcv(df_rel[['Open', 'Close', 'Volume']], max_points)
+
+    colors = np.where(df_rel['Close'].to_numpy() >= df_rel['Open'].to_numpy(), 'green', 'red')
     x = np.arange(len(df_rel))
 
     fig, ax = plt.subplots(figsize=(18,6))
@@ -124,56 +732,199 @@ def volume_plot(df_rel):
 
 
 
-def annual_performance(df):
+@timed('compute.annual_returns')
+def annual_returns(df, min_days: int = 30):
     '''
-    calculates yearly preformace of a security and plots it. upward green bars are % gain in a year while downward red bars are % loss in a year.
+    calculates yearly preformace of a security. this is the compute half of annual_performance,
+    it never copies the frame or builds a figure so it can be run over thousands of tickers.
+
+    every year's first/last close and bar count come out of one pass over the sorted closes,
+    and the annualization is done for all years at once.
 
     inputs:
     Pandas dataframe imported from Yfinance on the '1d' timeframe 
-    
-    
+    min_days: years with fewer bars than this are skipped
+
+    returns:
+    pandas Series of % return indexed by year
     '''
-    df = df.copy()
-    df["Year"] = df.index.year
-    results = {}
+    close = df['Close']
+    if not close.index.is_monotonic_increasing:
+        close = close.sort_index()
 
-    for year, group in df.groupby("Year"):
-        group = group.sort_index()
+    prices = close.to_numpy(dtype=float)
+    years = close.index.year.to_numpy()
+    if len(prices) == 0:
+        return pd.Series(dtype=float, name='Annual Return (%)')
 
-        # skip years with too few data points
-        if len(group) < 30:
-            continue
+    # positions where a new year starts, and the bar count of each year
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    ends = np.r_[starts[1:], len(prices)]
+    n_days = ends - starts
 
-        start_price = group['Close'].iloc[0]
-        end_price = group['Close'].iloc[-1]
+    # skip years with too few data points
+    keep = n_days >= min_days
+    starts, ends, n_days = starts[keep], ends[keep], n_days[keep]
+
+    total_return = prices[ends - 1] / prices[starts]
+
+    # annualize if less than a full year
+    annualized = np.where(n_days >= 360, total_return - 1, total_return ** (365 / n_days) - 1)
+
+    return pd.Series(annualized * 100, index=years[starts], name='Annual Return (%)')
 
-        n_days = len(group)
-        total_return = end_price / start_price
 
-        # annualize if less than a full year
-        if n_days >= 360:
-            annualized = total_return - 1
-        else:
-            annualized = (total_return ** (365 / n_days)) - 1
 
-        results[year] = annualized * 100
+def annual_performance_plot(returns):
+    '''
+    bar chart of annual_returns. upward green bars are % gain in a year while downward red bars are % loss in a year.
+    '''
+    import matplotlib.pyplot as plt
 
-    years = list(results.keys())
-    returns = list(results.values())
-    colors = ['green' if r >= 0 else 'red' for r in returns]
+    colors = np.where(returns.to_numpy() >= 0, 'green', 'red')
 
     fig, ax = plt.subplots(figsize=(10,5))
-    ax.bar(years, returns, color=colors)
+    ax.bar(returns.index, returns.to_numpy(), color=colors)
     ax.axhline(0, color='black', linewidth=0.8)
     ax.set_xlabel("Year")
     ax.set_ylabel("Annual Return (%)")
     ax.set_title("Annual Stock Returns")
 
-    return fig, results
+    return fig
+
+
 
+def annual_performance(df):
+    '''
+    calculates yearly preformace of a security and plots it. upward green bars are % gain in a year while downward red bars are % loss in a year.
+    use annual_returns directly when the figure isn't needed.
+
+    inputs:
+    Pandas dataframe imported from Yfinance on the '1d' timeframe 
+    
+    
+    '''
+    returns = annual_returns(df)
+    fig = annual_performance_plot(returns)
+
+    return fig, returns.to_dict()
+
+
+
+class VolatilityEngine:
+    '''
+    rolling historical volatility for any window out of one set of running sums.
+
+    the log returns, plus running (prefix) sums of the returns and the squared returns, are
+    worked out once per price history. the sum over any window is then just the difference
+    of two prefix sums, so a new window costs a few array subtractions instead of another
+    rolling().std() over the whole history, and nothing gets copied.
+
+    inputs:
+    close: pandas Series of closing prices on the '1d' timeframe, oldest first
+    trading_days : annualization factor. defaults to 252
+    '''
+
+    def __init__(self, close, trading_days=252):
+        prices = close.to_numpy(dtype=float)
+        log_return = np.log(prices[1:] / prices[:-1])
+
+        # gaps (NaN closes) count as 0 in the sums, and windows that touch one are dropped
+        valid = np.isfinite(log_return)
+        log_return = np.where(valid, log_return, 0.0)
+
+        self.index = close.index[1:]
+        self.trading_days = trading_days
+        self._sum = np.concatenate(([0.0], np.cumsum(log_return)))
+        self._sum_sq = np.concatenate(([0.0], np.cumsum(log_return * log_return)))
+        self._count = np.concatenate(([0], np.cumsum(valid)))
+
+    @property
+    def nbytes(self):
+        return self._sum.nbytes + self._sum_sq.nbytes + self._count.nbytes + self.index.nbytes
+
+    def _rolling(self, window: int):
+        # annualized rolling std (ddof=1 like pandas) for every window that fits, NaN where there is a gap
+        if window < 2:
+            raise ValueError("window must be at least 2")
+
+        s = self._sum[window:] - self._sum[:-window]
+        s_sq = self._sum_sq[window:] - self._sum_sq[:-window]
+        count = self._count[window:] - self._count[:-window]
+
+        var = (s_sq - s * s / window) / (window - 1)
+        vol = np.sqrt(np.maximum(var, 0.0) * self.trading_days)
+        vol[count < window] = np.nan
+        return vol
+
+    @timed('compute.volatility')
+    def rolling(self, window: int = 30):
+        '''
+        Pandas Series of rolling annualized vol for one window (same values as rolling(window).std())
+        '''
+        hv_series = pd.Series(self._rolling(window), index=self.index[window - 1:])
+        return hv_series.dropna()
+
+    def latest(self, window: int = 30):
+        '''
+        the most recent annualized vol for one window
+        '''
+        return float(self._rolling(window)[-1]) if len(self.index) >= window else np.nan
+
+    @timed('compute.volatility_surface')
+    def surface(self, windows=(10, 30, 60, 90, 252)):
+        '''
+        rolling annualized vol for several windows at once, all off the same prefix sums.
+
+        returns:
+        DataFrame indexed by date with one column per window
+        '''
+        columns = {}
+        for window in windows:
+            vol = np.full(len(self.index), np.nan)
+            if len(self.index) >= window:
+                vol[window - 1:] = self._rolling(window)
+            columns[window] = vol
+
+        return pd.DataFrame(columns, index=self.index)
+
+
+
+def get_volatility_engine(symbol: str, trading_days=252):
+    '''
+    one VolatilityEngine per ticker, shared by every session and slider position
+    '''
+    with span('data.vol_engine', ticker=symbol, cache='hit') as timer:
+        def load():
+            timer.set(cache='miss')
+            return VolatilityEngine(get_max_daily(symbol)['Close'], trading_days=trading_days)
 
+        return DATA_CACHE.get_or_load(('vol_engine', symbol, trading_days), load, expiry=lambda: expires_at('1d'))
 
-def historical_volatility(df_max, window=30, trading_days=252):
+
+
+def historical_volatility_plot(hv_series, window=30, max_points: int=MAX_LINE_POINTS):
+    '''
+    line chart of historical volatility with the latest value marked.
+    long histories are LTTB downsampled to max_points before drawing.
+    '''
+    import matplotlib.pyplot as plt
+
+    hv_drawn = decimate_line(hv_series, max_points)
+
+    fig, ax = plt.subplots(figsize=(10,5))
+    ax.plot(hv_drawn.index, hv_drawn, label=f"{window}-Day Historical Volatility")
+    ax.set_ylabel("Volatility (Annualized)")
+    ax.set_title(f"{window}-Day Historical Volatility")
+    ax.axhline(hv_series.iloc[-1], color='red', linestyle='--', linewidth=0.8, label=f"Latest HV: {hv_series.iloc[-1]:.2%}")
+    ax.legend()
+    ax.grid(True)
+
+    return fig
+
+
+
+def historical_volatility(df_max, window=30, trading_days=252, engine=None):
     """
     Calculate rolling historical volatility and optionally plot it.
 
@@ -181,6 +932,8 @@ def historical_volatility(df_max, window=30, trading_days=252):
     df: pandas DataFrame with 1d interval  
     window : rolling window size (in days). defualts to 30 days
     trading_days : annualization factor. defaults to 252. Prob will not let the user change it. 
+    engine : a VolatilityEngine already built for df_max (see get_volatility_engine). 
+             if left out one is built on the spot
 
     Returns:
     hv_series : Pandas Series of rolling annualized vol
@@ -189,37 +942,24 @@ def historical_volatility(df_max, window=30, trading_days=252):
     """
 
 
-    df_max = df_max.copy()
-    df_max['log_return'] = np.log(df_max['Close'] / df_max['Close'].shift(1))
-    rolling_daily_vol = df_max['log_return'].rolling(window).std()
-    hv_series = rolling_daily_vol * np.sqrt(trading_days)
-    hv_series = hv_series.dropna() 
+    if engine is None:
+        engine = VolatilityEngine(df_max['Close'], trading_days=trading_days)
 
-    fig, ax = plt.subplots(figsize=(10,5))
-    ax.plot(hv_series.index, hv_series, label=f"{window}-Day Historical Volatility")
-    ax.set_ylabel("Volatility (Annualized)")
-    ax.set_title(f"{window}-Day Historical Volatility")
-    ax.axhline(hv_series.iloc[-1], color='red', linestyle='--', linewidth=0.8, label=f"Latest HV: {hv_series.iloc[-1]:.2%}")
-    ax.legend()
-    ax.grid(True)
+    hv_series = engine.rolling(window)
+    fig = historical_volatility_plot(hv_series, window=window)
 
     return fig, hv_series
 
 
 
-def stock_compare(df_1, interval, ticker_mem, ticker_compare="SPY"):
+@timed('compute.compare_returns')
+def compare_returns(df_1, df_compare, ticker_mem, ticker_compare):
     '''
-    Compares a user-provided stock DataFrame (df_1) to another stock (default SPY)
-    using the same interval the user originally fetched 
+    compute half of stock_compare: lines the two closes up and works out the % returns.
 
-    df_1: stock dataframe already in memory
-    interval: interval used to fetch df_1 ("1d", "1wk", "1mo", etc)
-    ticker_mem: the ticker symbol for df_1 (for labeling)
-    ticker_compare: baseline ticker to compare against
+    returns:
+    df_pct, ret1, ret2, corr (correlation of the bar to bar returns over the whole span)
     '''
-
-    df_compare, _, _, _, _ = get_stock_data(ticker_compare, interval=interval)
-
     # ensure alignment - use ticker_mem instead of "Stock1"
     df_combined = pd.DataFrame({ticker_mem: df_1["Close"], ticker_compare: df_compare["Close"]}).dropna()
 
@@ -229,10 +969,152 @@ def stock_compare(df_1, interval, ticker_mem, ticker_compare="SPY"):
     # convert to %
     df_pct = (df_norm - 1) * 100
 
-    # plot - use ticker_mem for labels
+    # Metrics - use ticker_mem
+    ret1 = df_pct[ticker_mem].iloc[-1]
+    ret2 = df_pct[ticker_compare].iloc[-1]
+
+    # correlation of the bar to bar returns. price levels of any two trending stocks correlate
+    returns = df_combined.pct_change().iloc[1:]
+    corr = returns[ticker_mem].corr(returns[ticker_compare])
+
+    return df_pct, ret1, ret2, corr
+
+
+
+class PairStatsEngine:
+    '''
+    rolling correlation, beta and tracking error of a stock against a benchmark for any window,
+    out of one set of running sums.
+
+    the bar to bar returns x (stock) and y (benchmark) are lined up once, and prefix sums of
+    x, y, x^2, y^2 and xy are taken. every statistic over a window is then built from the
+    differences of those sums, so a new window is a handful of array subtractions instead of
+    a rolling().corr() (and cov, var...) over the whole history.
+
+    inputs:
+    close_x: pandas Series of the stock's closes
+    close_y: pandas Series of the benchmark's closes (same interval)
+    periods_per_year: annualization factor for the tracking error (see PERIODS_PER_YEAR)
+    '''
+
+    def __init__(self, close_x, close_y, periods_per_year=252):
+        df_combined = pd.concat([close_x, close_y], axis=1, join='inner').dropna()
+        prices = df_combined.to_numpy(dtype=float)
+        returns = prices[1:] / prices[:-1] - 1
+        x, y = returns[:, 0], returns[:, 1]
+
+        self.index = df_combined.index[1:]
+        self.periods_per_year = periods_per_year
+        self._sums = {
+            name: np.concatenate(([0.0], np.cumsum(values)))
+            for name, values in (('x', x), ('y', y), ('xx', x * x), ('yy', y * y), ('xy', x * y))
+        }
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._sums.values()) + self.index.nbytes
+
+    def rolling(self, window: int = 60):
+        '''
+        DataFrame indexed by date with the rolling corr, beta (stock vs benchmark) and
+        annualized tracking_error over the last window bars
+        '''
+        if window < 3:
+            raise ValueError("window must be at least 3")
+        if len(self.index) < window:
+            return pd.DataFrame(columns=['corr', 'beta', 'tracking_error'], dtype=float)
+
+        sx, sy, sxx, syy, sxy = (self._sums[k][window:] - self._sums[k][:-window] for k in ('x', 'y', 'xx', 'yy', 'xy'))
+
+        # sample (ddof=1) variances and covariance
+        var_x = np.maximum((sxx - sx * sx / window) / (window - 1), 0.0)
+        var_y = np.maximum((syy - sy * sy / window) / (window - 1), 0.0)
+        cov = (sxy - sx * sy / window) / (window - 1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+            beta = cov / var_y
+        tracking_error = np.sqrt(np.maximum(var_x + var_y - 2 * cov, 0.0) * self.periods_per_year)
+
+        return pd.DataFrame({'corr': corr, 'beta': beta, 'tracking_error': tracking_error}, index=self.index[window - 1:])
+
+
+
+def get_pair_engine(symbol: str, symbol_compare: str, interval: str):
+    '''
+    one PairStatsEngine per ticker pair and interval over their full histories, shared by every session
+    '''
+    def load():
+        return PairStatsEngine(
+            get_interval_bars(symbol, interval)['Close'],
+            get_interval_bars(symbol_compare, interval)['Close'],
+            periods_per_year=PERIODS_PER_YEAR.get(interval, 252),
+        )
+
+    return DATA_CACHE.get_or_load(('pair_engine', symbol, symbol_compare, interval), load, expiry=lambda: expires_at(interval))
+
+
+def rolling_pair_stats(symbol: str, symbol_compare: str, interval: str, window: int = None):
+    '''
+    rolling corr/beta/tracking error of symbol against symbol_compare (see PairStatsEngine),
+    cached per ticker pair, interval and window. window defaults to ROLLING_WINDOWS[interval].
+    '''
+    window = window or ROLLING_WINDOWS.get(interval, 60)
+    with span('data.pair_stats', ticker=symbol, interval=interval, cache='hit') as timer:
+        def load():
+            timer.set(cache='miss')
+            return get_pair_engine(symbol, symbol_compare, interval).rolling(window)
+
+        return DATA_CACHE.get_or_load(
+            ('pair_stats', symbol, symbol_compare, interval, window), load, expiry=lambda: expires_at(interval))
+
+
+
+def rolling_stats_plot(df_stats, window, ticker_mem, ticker_compare, max_points: int=MAX_LINE_POINTS):
+    '''
+    rolling correlation, beta and tracking error stacked on a shared date axis, meant to sit
+    under the comparison chart. each line is LTTB downsampled to max_points before drawing.
+    '''
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
+
+    fig, axes = plt.subplots(3, 1, figsize=(10, 7), sharex=True)
+    panels = [
+        ('corr', f"Rolling Correlation ({window} bars)", 0, None),
+        ('beta', f"Rolling Beta of {ticker_mem} vs {ticker_compare}", 1, None),
+        ('tracking_error', "Rolling Tracking Error (annualized)", None, FuncFormatter(lambda y, _: f'{y:.0%}')),
+    ]
+    for ax, (column, title, reference, formatter) in zip(axes, panels):
+        line = decimate_line(df_stats[column].dropna(), max_points)
+        ax.plot(line.index, line, linewidth=1.2)
+        if reference is not None:
+            ax.axhline(reference, color='black', linewidth=0.8, linestyle='--')
+        if formatter is not None:
+            ax.yaxis.set_major_formatter(formatter)
+        ax.set_title(title, fontsize='medium')
+        ax.grid(True, alpha=0.3)
+
+    axes[-1].set_xlabel("Date")
+    plt.tight_layout()
+
+    return fig
+
+
+
+def stock_compare_plot(df_pct, interval, highlight=None, max_points: int=MAX_LINE_POINTS):
+    '''
+    percent return chart for every column of df_pct. highlight draws one ticker thicker
+    than the rest, which helps when comparing against a whole basket.
+    each line is LTTB downsampled to max_points before drawing.
+    '''
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
+
     fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(df_pct.index, df_pct[ticker_mem], label=ticker_mem, linewidth=2)
-    ax.plot(df_pct.index, df_pct[ticker_compare], label=ticker_compare, linewidth=2)
+    for ticker in df_pct.columns:
+        linewidth = 2 if highlight is None else (2.5 if ticker == highlight else 1)
+        line = decimate_line(df_pct[ticker], max_points)
+        ax.plot(line.index, line, label=ticker, linewidth=linewidth)
 
     # format y-axis as %
     ax.yaxis.set_major_formatter(FuncFormatter(lambda y, _: f'{y:.0f}%'))
@@ -245,12 +1127,131 @@ def stock_compare(df_1, interval, ticker_mem, ticker_compare="SPY"):
     ax.set_xlabel("Date")
     ax.set_ylabel("Return")
     ax.grid(True, alpha=0.3)
-    ax.legend()
+    ax.legend(ncol=max(len(df_pct.columns) // 10, 1), fontsize='small' if len(df_pct.columns) > 2 else None)
     plt.tight_layout()
 
-    # Metrics - use ticker_mem
-    ret1 = df_pct[ticker_mem].iloc[-1]
-    ret2 = df_pct[ticker_compare].iloc[-1]
-    corr = df_combined[ticker_mem].corr(df_combined[ticker_compare])
+    return fig
+
+
+
+def stock_compare(df_1, interval, ticker_mem, ticker_compare="SPY"):
+    '''
+    Compares a user-provided stock DataFrame (df_1) to another stock (default SPY)
+    using the same interval the user originally fetched 
+
+    df_1: stock dataframe already in memory
+    interval: interval used to fetch df_1 ("1d", "1wk", "1mo", etc)
+    ticker_mem: the ticker symbol for df_1 (for labeling)
+    ticker_compare: baseline ticker to compare against
+    '''
+
+    # only the bars over df_1's dates are needed here, never the max daily history or info
+    df_compare = get_range(ticker_compare, interval, *frame_span(df_1))
+
+    df_pct, ret1, ret2, corr = compare_returns(df_1, df_compare, ticker_mem, ticker_compare)
+    fig = stock_compare_plot(df_pct, interval)
 
     return fig, df_pct, ret1, ret2, corr
+
+
+
+def compare_rolling(df_pct, interval, ticker_mem, ticker_compare="SPY", window=None):
+    '''
+    compute half of stock_compare_rolling: rolling_pair_stats cut to the dates df_pct covers
+    '''
+    df_stats = rolling_pair_stats(ticker_mem, ticker_compare, interval, window)
+    return slice_range(df_stats, *frame_span(df_pct))
+
+
+
+def stock_compare_rolling(df_pct, interval, ticker_mem, ticker_compare="SPY", window=None):
+    '''
+    the rolling half of the comparison: rolling correlation, beta and tracking error of
+    ticker_mem against ticker_compare, over the same dates as stock_compare's chart so it
+    can be drawn right under it.
+
+    window: bars per window. defaults to ROLLING_WINDOWS[interval]
+
+    returns:
+    fig, df_stats (DataFrame of corr, beta, tracking_error)
+    '''
+    window = window or ROLLING_WINDOWS.get(interval, 60)
+    df_stats = compare_rolling(df_pct, interval, ticker_mem, ticker_compare, window)
+    fig = rolling_stats_plot(df_stats, window, ticker_mem, ticker_compare)
+
+    return fig, df_stats
+
+
+
+def align_closes(frames: dict):
+    '''
+    lines up the Close columns of several frames on their common dates (same dropna
+    alignment stock_compare uses) and hands them back as one dates x tickers matrix.
+
+    inputs:
+    frames: dict of {ticker: DataFrame}. empty frames are skipped
+
+    returns:
+    (dates, tickers, closes) where closes is a 2D NumPy array, one column per ticker
+    '''
+    closes = {ticker: df['Close'] for ticker, df in frames.items() if not df.empty}
+    if not closes:
+        return pd.DatetimeIndex([]), [], np.empty((0, 0))
+
+    df_combined = pd.concat(closes, axis=1, join='inner').dropna()
+    return df_combined.index, list(df_combined.columns), df_combined.to_numpy(dtype=float)
+
+
+
+@timed('compute.compare_basket')
+def compare_basket(df_1, interval, ticker_mem, tickers_compare, period='max'):
+    '''
+    compute half of stock_compare_many. the basket is fetched in parallel (fetch_many)
+    and everything is worked out on one aligned dates x tickers matrix.
+
+    returns:
+    df_pct (percent return per ticker), returns (Series of total % return), corr (correlation matrix DataFrame)
+    '''
+    frames = fetch_many([t for t in tickers_compare if t.strip().upper() != ticker_mem], period=period, interval=interval)
+    missing = [ticker for ticker, df in frames.items() if df.empty]
+    if missing:
+        raise ValueError(f"No data found for: {', '.join(missing)}")
+
+    # only df_1's dates can line up, so the rest of each history never gets aligned
+    frames = {ticker: slice_range(df, *frame_span(df_1)) for ticker, df in frames.items()}
+
+    dates, tickers, closes = align_closes({ticker_mem: df_1, **frames})
+    if len(dates) < 2:
+        raise ValueError("Not enough overlapping data to compare")
+
+    # normalize and convert to %, all tickers at once
+    pct = (closes / closes[0] - 1) * 100
+    df_pct = pd.DataFrame(pct, index=dates, columns=tickers)
+
+    returns = pd.Series(pct[-1], index=tickers)
+    corr = pd.DataFrame(np.corrcoef(closes[1:] / closes[:-1] - 1, rowvar=False), index=tickers, columns=tickers)
+
+    return df_pct, returns, corr
+
+
+
+def stock_compare_many(df_1, interval, ticker_mem, tickers_compare, period='max'):
+    '''
+    Compares a user-provided stock DataFrame (df_1) to a whole basket of tickers
+    (SPY, QQQ, sector ETFs, peers...) using the same interval the user originally fetched.
+
+    df_1: stock dataframe already in memory
+    interval: interval used to fetch df_1 ("1d", "1wk", "1mo", etc)
+    ticker_mem: the ticker symbol for df_1 (for labeling)
+    tickers_compare: list of tickers to compare against
+    period: period to fetch the basket with. defaults to 'max' like stock_compare
+
+    returns:
+    fig, df_pct (percent return per ticker), returns (Series of total % return), corr (correlation matrix DataFrame)
+    '''
+    df_pct, returns, corr = compare_basket(df_1, interval, ticker_mem, tickers_compare, period=period)
+
+    # main ticker drawn thicker so it stands out from the basket
+    fig = stock_compare_plot(df_pct, interval, highlight=ticker_mem)
+
+    return fig, df_pct, returns, corr
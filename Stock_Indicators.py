@@ -0,0 +1,252 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from Stock_Functions import DATA_CACHE, get_interval_bars, RESAMPLE_RULES, frame_version
+from Stock_Metrics import span
+
+# overlays the chart page offers, label -> indicator spec. a spec is a tuple of the
+# indicator's name and its parameters, so a set of them can be a cache key
+INDICATOR_CHOICES = {
+    'SMA 20': ('sma', 20),
+    'SMA 50': ('sma', 50),
+    'SMA 200': ('sma', 200),
+    'EMA 12': ('ema', 12),
+    'EMA 26': ('ema', 26),
+    'Bollinger (20, 2)': ('bbands', 20, 2.0),
+    'RSI 14': ('rsi', 14),
+    'VWAP': ('vwap',),
+}
+
+
+def _extend_prefix(prefix, values, start):
+    # running sum with a leading 0 (prefix[i] = sum of the first i bars). values are bars start
+    # onwards, everything before them is kept as it was
+    if start == 0:
+        return np.r_[0.0, np.cumsum(values)]
+
+    return np.concatenate((prefix[:start + 1], prefix[start] + np.cumsum(values)))
+
+
+def _extend_ewm(previous, values, start, alpha):
+    # exponential average y[i] = alpha * x[i] + (1 - alpha) * y[i-1] of bars start onwards.
+    # the first bar seeds it (pandas' adjust=False), later bars continue from y[start-1]
+    if start == 0:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+    seeded = pd.Series(np.r_[previous[start - 1], values]).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return np.concatenate((previous[:start], seeded[1:]))
+
+
+class IndicatorEngine:
+    '''
+    technical indicators for one price history, for any mix of:
+    ('sma', window), ('ema', span), ('bbands', window, k), ('rsi', period), ('vwap',)
+
+    everything is worked out in one pass over the bars: running sums of the close, close^2,
+    price x volume and volume are shared by SMA, Bollinger and VWAP, and EMA/RSI are single
+    exponential averages. when the history gets new bars, update() only computes from the last
+    known bar on (that bar may have been partial) instead of starting over.
+
+    VWAP restarts every session on intraday intervals. on daily and longer bars it is anchored
+    to the first bar of whatever range frame() is asked for.
+
+    inputs:
+    specs: tuple of indicator specs (see INDICATOR_CHOICES)
+    intraday: True for 1m/1h bars, decides how VWAP is anchored
+    '''
+
+    def __init__(self, specs, intraday: bool = False):
+        self.specs = tuple(specs)
+        self.intraday = intraday
+        self.index = pd.DatetimeIndex([])
+        self._version = None
+        self._first_bar = None
+        self._last_open = np.nan
+        self._sums = {}
+        self._outputs = {}
+        self._shift = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        arrays = list(self._sums.values()) + list(self._outputs.values())
+        return sum(a.nbytes for a in arrays) + self.index.nbytes
+
+    def update(self, df):
+        '''
+        brings the indicators up to date with df (the full history, oldest first). the same
+        history as last time is free, a longer version of it only costs the new bars. a
+        history whose old bars changed (yahoo re-adjusted it for a split or dividend) is
+        computed again from scratch.
+        '''
+        with self._lock:
+            version = frame_version(df)
+            if version == self._version and self._same_first_bar(df):
+                return self
+
+            n_old = len(self.index)
+            extends = (0 < n_old <= len(df) and df.index[0] == self.index[0] and df.index[n_old - 1] == self.index[-1]
+                       and self._same_first_bar(df) and self._same_open(df, n_old - 1, self._last_open))
+            self._compute(df, n_old - 1 if extends else 0)
+
+            # only a fingerprint of df is kept, not df itself, so a replaced history isn't held on to
+            self.index = df.index
+            self._version = version
+            self._first_bar = (df['Open'].iloc[0], df['Close'].iloc[0]) if len(df) else None
+            self._last_open = df['Open'].iloc[-1] if len(df) else np.nan
+        return self
+
+    def _same_first_bar(self, df):
+        # a re-adjusted history changes every bar before the split/dividend, the first one included
+        if self._first_bar is None or len(df) == 0:
+            return False
+        return self._same_open(df, 0, self._first_bar[0]) and np.isclose(df['Close'].iloc[0], self._first_bar[1], rtol=1e-4, equal_nan=True)
+
+    @staticmethod
+    def _same_open(df, position, open_):
+        # the open of a bar doesn't move once it has started, even while the bar is still partial
+        return bool(np.isclose(df['Open'].iloc[position], open_, rtol=1e-4, equal_nan=True))
+
+    def _compute(self, df, start):
+        # caller holds the lock. everything before bar start is kept, start onwards is (re)computed
+        # and only those bars (plus the one before, for RSI) get read out of df.
+        # a missing close would poison every running sum after it, so it carries the last one forward
+        lo = max(start - 1, 0)
+        close_from_lo = df['Close'].iloc[lo:].ffill().to_numpy(dtype=float)
+        close = close_from_lo[start - lo:]
+        tail = df.iloc[start:]
+        needs = {spec[0] for spec in self.specs}
+        sums, out = self._sums, self._outputs
+        if start == 0:
+            sums.clear()
+            out.clear()
+
+        if needs & {'sma', 'bbands'}:
+            sums['close'] = _extend_prefix(sums.get('close'), close, start)
+        if 'bbands' in needs:
+            # squares of the distance from the first close, so the variance doesn't come out of
+            # the difference of two huge sums
+            if start == 0:
+                self._shift = close[0]
+            sums['close_sq'] = _extend_prefix(sums.get('close_sq'), (close - self._shift) ** 2, start)
+        if 'vwap' in needs:
+            volume = np.nan_to_num(tail['Volume'].to_numpy(dtype=float))
+            high = np.fmax(tail['High'].to_numpy(dtype=float), close)
+            low = np.fmin(tail['Low'].to_numpy(dtype=float), close)
+            typical = (high + low + close) / 3
+            sums['pv'] = _extend_prefix(sums.get('pv'), typical * volume, start)
+            sums['volume'] = _extend_prefix(sums.get('volume'), volume, start)
+            if self.intraday:
+                out['session_start'] = self._session_starts(df.index, start)
+
+        for spec in self.specs:
+            kind = spec[0]
+            if kind == 'ema':
+                out[spec] = _extend_ewm(out.get(spec), close, start, 2 / (spec[1] + 1))
+            elif kind == 'rsi':
+                if start <= spec[1]:
+                    # still inside the warm up, cheaper to start over than to special case it
+                    self._rsi(spec, df['Close'].ffill().to_numpy(dtype=float), 0)
+                else:
+                    self._rsi(spec, close_from_lo, start)
+
+    def _session_starts(self, index, start):
+        # position of the first bar of each bar's trading day, recomputed from bar start on
+        lo = max(start - 1, 0)
+        days = index[lo:].normalize().asi8
+        first = np.where(np.r_[True, days[1:] != days[:-1]], lo + np.arange(len(days)), 0)
+        if start:
+            # bar start-1 keeps the session it already had
+            first[0] = self._outputs['session_start'][lo]
+            return np.concatenate((self._outputs['session_start'][:lo], np.maximum.accumulate(first)))
+        return np.maximum.accumulate(first)
+
+    def _rsi(self, spec, close, start):
+        # Wilder's RSI: exponential averages (alpha = 1/period) of the gains and losses.
+        # close is bars start-1 onwards (bars 0 onwards when start is 0)
+        period = spec[1]
+        out = self._outputs
+
+        delta = np.diff(close) if start else np.diff(close, prepend=close[0])
+        gain = np.maximum(delta, 0.0)
+        loss = np.maximum(-delta, 0.0)
+
+        avg_gain = _extend_ewm(out.get((spec, 'gain')), gain, start, 1 / period)
+        avg_loss = _extend_ewm(out.get((spec, 'loss')), loss, start, 1 / period)
+        out[(spec, 'gain')], out[(spec, 'loss')] = avg_gain, avg_loss
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rsi = np.where(avg_loss > 0, 100 - 100 / (1 + avg_gain / avg_loss), 100.0)
+        rsi[:period] = np.nan
+        out[spec] = rsi
+
+    def _window_mean(self, name, window, lo, hi):
+        # mean over the last window bars for every bar in lo..hi, NaN until window bars exist
+        prefix = self._sums[name]
+        ends = np.arange(lo, hi) + 1
+        starts = ends - window
+        mean = (prefix[ends] - prefix[np.maximum(starts, 0)]) / window
+        mean[starts < 0] = np.nan
+        return mean
+
+    def frame(self, df_rel=None):
+        '''
+        every indicator as a DataFrame column, for the bars of df_rel (a slice of the history
+        update() was given) or for the whole history. columns look like 'SMA 20', 'EMA 12',
+        'BB 20 Upper' / 'BB 20 Mid' / 'BB 20 Lower', 'RSI 14' and 'VWAP'.
+        '''
+        with self._lock:
+            lo, hi = 0, len(self.index)
+            if df_rel is not None and len(df_rel):
+                lo = self.index.searchsorted(df_rel.index[0])
+                hi = self.index.searchsorted(df_rel.index[-1], side='right')
+            elif df_rel is not None:
+                hi = 0
+
+            columns = {}
+            for spec in self.specs:
+                kind = spec[0]
+                if kind == 'sma':
+                    columns[f'SMA {spec[1]}'] = self._window_mean('close', spec[1], lo, hi)
+                elif kind == 'ema':
+                    columns[f'EMA {spec[1]}'] = self._outputs[spec][lo:hi]
+                elif kind == 'bbands':
+                    window, k = spec[1], spec[2]
+                    mean = self._window_mean('close', window, lo, hi)
+                    shifted = mean - self._shift
+                    std = np.sqrt(np.maximum(self._window_mean('close_sq', window, lo, hi) - shifted * shifted, 0.0))
+                    columns[f'BB {window} Upper'] = mean + k * std
+                    columns[f'BB {window} Mid'] = mean
+                    columns[f'BB {window} Lower'] = mean - k * std
+                elif kind == 'rsi':
+                    columns[f'RSI {spec[1]}'] = self._outputs[spec][lo:hi]
+                elif kind == 'vwap':
+                    positions = np.arange(lo, hi)
+                    anchor = np.maximum(self._outputs['session_start'][lo:hi], lo) if self.intraday else np.full(hi - lo, lo)
+                    pv, volume = self._sums['pv'], self._sums['volume']
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        columns['VWAP'] = (pv[positions + 1] - pv[anchor]) / (volume[positions + 1] - volume[anchor])
+
+            return pd.DataFrame(columns, index=self.index[lo:hi])
+
+
+def get_indicators(symbol: str, interval: str, specs, df_rel=None):
+    '''
+    indicator columns for df_rel (or the full history), off one IndicatorEngine per ticker,
+    interval and set of specs, shared by every session. the engine lives on in DATA_CACHE
+    across data refreshes and is only extended with the bars that are new.
+    '''
+    specs = tuple(sorted(set(specs), key=str))
+    if not specs:
+        return pd.DataFrame(index=df_rel.index if df_rel is not None else None)
+
+    intraday = interval not in RESAMPLE_RULES and interval != '1d'
+    with span('data.indicators', ticker=symbol, interval=interval, cache='hit') as timer:
+        def load():
+            timer.set(cache='miss')
+            return IndicatorEngine(specs, intraday=intraday).update(get_interval_bars(symbol, interval))
+
+        engine = DATA_CACHE.get_or_load(('indicators', symbol, interval, specs), load)
+        return engine.update(get_interval_bars(symbol, interval)).frame(df_rel)
@@ -0,0 +1,253 @@
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from Stock_Cache import LRUCache, estimate_nbytes
+from Stock_Functions import get_history
+from Stock_Providers import get_provider
+from Stock_Metrics import span
+
+# live feeds shared by every session watching the same ticker/period. idle ones fall out
+# once more than 64 are open
+LIVE_FEEDS = LRUCache(max_entries=64, sizeof=estimate_nbytes)
+
+# seconds between polls of the upstream for one feed, however many sessions are watching it
+LIVE_POLL_SECONDS = 15
+
+# bars in one regular session of 1m data, the smallest ring a feed gets
+SESSION_MINUTES = 390
+
+RING_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class Welford:
+    '''
+    running count/mean/variance with Welford's method. bars can be added and removed one batch
+    at a time, so the statistics of a sliding window cost O(changed bars) to keep up to date
+    instead of another np.std over the whole window.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values):
+        '''
+        adds a batch of values (merged in with Chan's parallel update)
+        '''
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n == 0:
+            return
+
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = self.count + n
+        delta = batch_mean - self.mean
+
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def remove(self, values):
+        '''
+        takes values that were added earlier back out
+        '''
+        for x in np.asarray(values, dtype=float):
+            if self.count <= 1:
+                self.count, self.mean, self.m2 = 0, 0.0, 0.0
+                continue
+
+            old_mean = self.mean
+            self.count -= 1
+            self.mean = (old_mean * (self.count + 1) - x) / self.count
+            self.m2 = max(self.m2 - (x - old_mean) * (x - self.mean), 0.0)
+
+    @property
+    def variance(self):
+        # population variance (ddof=0), the same as np.var / the np.std get_stock_data uses
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return self.variance ** 0.5
+
+
+class BarRing:
+    '''
+    fixed size ring buffer of OHLCV bars. once full, every new bar overwrites the oldest one,
+    so memory and frame() stay the same size no matter how long a live session runs.
+
+    inputs:
+    capacity: most bars kept
+    tz: timezone of the timestamps
+    '''
+
+    def __init__(self, capacity: int, tz=None):
+        self.capacity = capacity
+        self.tz = tz
+        self.stamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, len(RING_COLUMNS)))
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.stamps.nbytes + self.values.nbytes
+
+    def _slots(self, first, n):
+        # ring positions of the bars first..first+n (0 = oldest)
+        return (self.start + first + np.arange(n)) % self.capacity
+
+    @property
+    def last_stamp(self):
+        return self.stamps[(self.start + self.size - 1) % self.capacity] if self.size else None
+
+    @property
+    def last_row(self):
+        return self.values[(self.start + self.size - 1) % self.capacity]
+
+    def replace_last(self, row):
+        '''
+        overwrites the newest bar (a partial bar that kept trading). returns the old row
+        '''
+        slot = (self.start + self.size - 1) % self.capacity
+        old = self.values[slot].copy()
+        self.values[slot] = row
+        return old
+
+    def extend(self, stamps, rows):
+        '''
+        appends bars, oldest first. returns the rows that got pushed out of the ring
+        '''
+        if len(stamps) > self.capacity:
+            # only the newest capacity bars can survive, the rest would be pushed out anyway
+            dropped = [self.frame_values(), rows[:-self.capacity]]
+            stamps, rows = stamps[-self.capacity:], rows[-self.capacity:]
+            self.start, self.size = 0, 0
+        else:
+            overflow = max(self.size + len(stamps) - self.capacity, 0)
+            dropped = [self.values[self._slots(0, overflow)]]
+            self.start = (self.start + overflow) % self.capacity
+            self.size -= overflow
+
+        slots = self._slots(self.size, len(stamps))
+        self.stamps[slots] = stamps
+        self.values[slots] = rows
+        self.size += len(stamps)
+        return np.concatenate(dropped)
+
+    def frame_values(self):
+        return self.values[self._slots(0, self.size)]
+
+    def frame(self):
+        '''
+        the bars as an OHLCV DataFrame, oldest first
+        '''
+        order = self._slots(0, self.size)
+        index = pd.DatetimeIndex(self.stamps[order]).tz_localize('UTC')
+        if self.tz is not None:
+            index = index.tz_convert(self.tz)
+        return pd.DataFrame(self.values[order], index=index, columns=RING_COLUMNS)
+
+
+class LiveFeed:
+    '''
+    streaming 1m bars for one ticker. seeded once from the stored history, then every poll
+    only asks the provider for bars from the last timestamp on and appends them to a ring
+    sized to the selected period, so the chart slides forward instead of growing.
+    summary statistics of the closes in the ring (std/variance) are kept with Welford and only
+    touch the bars that changed.
+
+    inputs:
+    symbol: ticker
+    period: period the ring covers ('1d' or '1wk'), sets its size from the seed history
+    '''
+
+    def __init__(self, symbol: str, period: str = '1d'):
+        self.symbol = symbol.upper()
+        self.period = period
+        self.stats = Welford()
+        self._lock = threading.Lock()
+        self._polled = 0.0
+
+        df_seed = get_history(self.symbol, period=period, interval='1m')
+        self.ring = BarRing(max(len(df_seed), SESSION_MINUTES), tz=df_seed.index.tz if len(df_seed) else 'America/New_York')
+        if len(df_seed):
+            self._append(df_seed)
+
+    def _append(self, df_new):
+        # caller holds the lock (or is __init__). df_new starts at or after the last bar
+        df_new = df_new.dropna(subset=['Close'])
+        rows = df_new[RING_COLUMNS].to_numpy(dtype=float)
+        stamps = df_new.index.as_unit('ns').asi8
+        close = RING_COLUMNS.index('Close')
+
+        if len(self.ring) and len(stamps) and stamps[0] == self.ring.last_stamp:
+            # the last bar was still forming when it was fetched, swap in the final version
+            old = self.ring.replace_last(rows[0])
+            self.stats.remove([old[close]])
+            self.stats.add([rows[0][close]])
+            rows, stamps = rows[1:], stamps[1:]
+
+        if len(stamps):
+            # added before the dropped bars come out, since some of those can be new bars too
+            dropped = self.ring.extend(stamps, rows)
+            self.stats.add(rows[:, close])
+            self.stats.remove(dropped[:, close])
+
+        return len(stamps)
+
+    def poll(self, min_interval: float = LIVE_POLL_SECONDS):
+        '''
+        fetches bars newer than the last one, at most once every min_interval seconds
+        (however many sessions call it). returns how many new bars arrived
+        '''
+        with self._lock:
+            now = time.monotonic()
+            if now - self._polled < min_interval:
+                return 0
+            self._polled = now
+
+            last = self.ring.last_stamp
+            with span('live.poll', ticker=self.symbol, interval='1m'):
+                if last is None:
+                    df_new = get_provider().history(self.symbol, interval='1m', period=self.period)
+                else:
+                    last = pd.Timestamp(last, tz='UTC').tz_convert(self.ring.tz)
+                    df_new = get_provider().history(self.symbol, interval='1m', start=last)
+                    df_new = df_new.iloc[df_new.index.searchsorted(last):]
+
+                if df_new.empty:
+                    return 0
+                return self._append(df_new)
+
+    @property
+    def nbytes(self):
+        return self.ring.nbytes
+
+    def frame(self):
+        with self._lock:
+            return self.ring.frame()
+
+    def summary(self):
+        '''
+        (bars, last close, std, variance) of the closes in the ring
+        '''
+        with self._lock:
+            last_close = self.ring.last_row[RING_COLUMNS.index('Close')] if len(self.ring) else np.nan
+            return len(self.ring), last_close, self.stats.std, self.stats.variance
+
+
+def get_live_feed(symbol: str, period: str = '1d'):
+    '''
+    the shared LiveFeed for a ticker/period, created (and seeded) on first use
+    '''
+    symbol = symbol.upper()
+    return LIVE_FEEDS.get_or_load(('live', symbol, period), lambda: LiveFeed(symbol, period))
@@ -0,0 +1,248 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import contextvars
+
+# timing spans around the fetch/compute/render stages, aggregated into histograms.
+# off unless STOCK_METRICS=1, and while off span() hands back a shared do-nothing object,
+# so the instrumented code pays about one function call per span.
+ENABLED = os.environ.get("STOCK_METRICS", "0") == "1"
+
+# the only tags kept on a span, anything else passed to span() is ignored. in the app there is
+# one series per stage x ticker x interval x period x cache, so it grows with every ticker
+# looked at (a screener scan or batch run adds thousands). that's fine for the admin page's
+# snapshot, but the Prometheus export only uses EXPORT_LABELS and merges the tickers together,
+# which keeps its series bounded (stage x interval x period x cache)
+LABELS = ('ticker', 'interval', 'period', 'cache')
+EXPORT_LABELS = tuple(label for label in LABELS if label != 'ticker')
+
+# histogram bucket upper bounds in seconds: 100us to ~2min, 25% apart. percentiles are read
+# off these buckets, so they're accurate to within a bucket (~12%)
+BUCKETS = tuple(1e-4 * 1.25 ** i for i in range(64))
+
+# tags set by the page that is running (ticker, interval, period), picked up by every span
+# opened underneath it in the same thread
+_page_tags = contextvars.ContextVar('stock_metric_tags', default={})
+
+
+class Histogram:
+    '''
+    latency histogram with fixed log-spaced buckets (the same ones Prometheus gets).
+    '''
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float):
+        '''
+        estimated q-th percentile (0-100) in seconds, interpolated inside the bucket it falls in
+        '''
+        if self.count == 0:
+            return 0.0
+
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class MetricsRegistry:
+    '''
+    every histogram, keyed by (stage, tags). thread safe, since the prefetcher and
+    fetch_many record spans from worker threads.
+    '''
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, tags: dict, seconds: float):
+        key = (stage, tuple(tags.get(label, '') for label in LABELS))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        '''
+        one dict per series: stage, the tags, count, total/mean/max seconds and p50/p95/p99
+        '''
+        with self._lock:
+            items = [(key, h.count, h.sum, h.max, h.percentile(50), h.percentile(95), h.percentile(99))
+                     for key, h in self._histograms.items()]
+
+        rows = []
+        for (stage, values), count, total, worst, p50, p95, p99 in sorted(items):
+            row = {'stage': stage, **dict(zip(LABELS, values))}
+            row.update(count=count, total_s=total, mean_s=total / count, p50_s=p50, p95_s=p95, p99_s=p99, max_s=worst)
+            rows.append(row)
+        return rows
+
+    def prometheus_text(self, prefix: str = 'stock_app_stage_seconds'):
+        '''
+        every histogram in Prometheus' text exposition format, labelled with EXPORT_LABELS only
+        (series that differ just by ticker are added together)
+        '''
+        keep = [LABELS.index(label) for label in EXPORT_LABELS]
+        merged = {}
+        with self._lock:
+            for (stage, values), h in self._histograms.items():
+                key = (stage, tuple(values[i] for i in keep))
+                counts, count, total = merged.get(key, ([0] * len(h.counts), 0, 0.0))
+                merged[key] = ([a + b for a, b in zip(counts, h.counts)], count + h.count, total + h.sum)
+
+        lines = [
+            f"# HELP {prefix} Time spent per fetch/compute/render stage.",
+            f"# TYPE {prefix} histogram",
+        ]
+        for (stage, values), (counts, count, total) in sorted(merged.items()):
+            labels = ','.join([f'stage="{_escape(stage)}"'] + [f'{k}="{_escape(v)}"' for k, v in zip(EXPORT_LABELS, values)])
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f'{prefix}_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{prefix}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{prefix}_sum{{{labels}}} {total:.9g}')
+            lines.append(f'{prefix}_count{{{labels}}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Span:
+    '''
+    times a with-block and records it under stage. tags can still be filled in while the
+    block runs, e.g. span.set(cache='miss') once it's known the data wasn't cached.
+    '''
+
+    __slots__ = ('stage', 'tags', 'start')
+
+    def __init__(self, stage: str, tags: dict):
+        self.stage = stage
+        self.tags = tags
+
+    def set(self, **tags):
+        self.tags.update(tags)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.stage, self.tags, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    # what span() returns while metrics are off
+
+    __slots__ = ()
+
+    def set(self, **tags):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str, **tags):
+    '''
+    timing span for one stage, used as a with-block:
+
+    with span('fetch.upstream', ticker='AAPL', interval='1d'):
+        ...
+
+    tags not given here are taken from set_page_tags(). None values are dropped.
+    '''
+    if not ENABLED:
+        return NOOP_SPAN
+
+    merged = dict(_page_tags.get())
+    merged.update((k, v) for k, v in tags.items() if v is not None)
+    return Span(stage, merged)
+
+
+def timed(stage: str):
+    '''
+    decorator putting a span around every call of a function. tags come from set_page_tags()
+    '''
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_page_tags(**tags):
+    '''
+    tags (ticker, interval, period) for every span the current page run opens from here on
+    '''
+    if ENABLED:
+        _page_tags.set({k: v for k, v in tags.items() if v is not None})
+
+
+def write_prometheus(path: str):
+    '''
+    writes the Prometheus text to path (swapped in whole, so a scraper never sees half a file)
+    '''
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(REGISTRY.prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def _export_loop(path: str, every: float):
+    while True:
+        time.sleep(every)
+        try:
+            write_prometheus(path)
+        except OSError:
+            pass
+
+
+# STOCK_METRICS_FILE=/path/stock_app.prom rewrites that file every STOCK_METRICS_EVERY seconds
+# (default 15), for node_exporter's textfile collector or anything else that reads the format
+if ENABLED and os.environ.get("STOCK_METRICS_FILE"):
+    threading.Thread(
+        target=_export_loop,
+        args=(os.environ["STOCK_METRICS_FILE"], float(os.environ.get("STOCK_METRICS_EVERY", 15))),
+        name='metrics-export',
+        daemon=True,
+    ).start()
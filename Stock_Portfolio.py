@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from Stock_Cache import expires_at
+from Stock_Functions import DATA_CACHE, fetch_many, align_closes
+from Stock_Metrics import timed
+
+# what the portfolio page starts out with
+DEFAULT_HOLDINGS = """SPY 30
+QQQ 15
+AAPL 10
+MSFT 10
+NVDA 5
+JPM 5
+XOM 5
+JNJ 5
+GLD 10
+TLT 5"""
+
+
+def parse_holdings(text: str):
+    '''
+    holdings out of free text, one per line: "AAPL 10", "AAPL, 10", "AAPL: 10%" or just "AAPL"
+    (weight 1). weights are relative, they get scaled to add up to 1. '#' starts a comment.
+    a ticker listed twice has its weights added.
+
+    returns:
+    dict of {ticker: weight}
+    '''
+    holdings = {}
+    for line in text.splitlines():
+        parts = line.split('#', 1)[0].replace(',', ' ').replace(':', ' ').replace('%', ' ').split()
+        if not parts:
+            continue
+        ticker = parts[0].upper()
+        weight = float(parts[1]) if len(parts) > 1 else 1.0
+        holdings[ticker] = holdings.get(ticker, 0.0) + weight
+
+    total = sum(holdings.values())
+    if holdings and total == 0:
+        raise ValueError("Weights add up to 0")
+    return {ticker: weight / total for ticker, weight in holdings.items()}
+
+
+class PortfolioRisk:
+    '''
+    risk model of a set of holdings, built once per set of tickers so re-weighting is only
+    a few matrix-vector products.
+
+    the daily log returns (the same returns and 252 day annualization historical_volatility
+    uses) go into one annualized covariance matrix. portfolio volatility and each holding's
+    marginal / component contribution come out of that matrix and the weights. historical VaR
+    comes from the past simple returns of every holding times the weights.
+
+    inputs:
+    closes: 2D NumPy array of aligned daily closes, dates x tickers (see align_closes)
+    tickers: list of tickers, one per column
+    dates: dates of the rows
+    trading_days: annualization factor. defaults to 252
+    '''
+
+    def __init__(self, closes, tickers, dates=None, trading_days=252):
+        if closes.shape[0] < 3:
+            raise ValueError("Not enough overlapping history to estimate risk")
+
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.trading_days = trading_days
+        self.log_returns = np.log(closes[1:] / closes[:-1])
+        self.simple_returns = np.expm1(self.log_returns)
+        self.cov = np.cov(self.log_returns, rowvar=False) * trading_days
+        self.vols = np.sqrt(np.diag(self.cov))
+
+    @property
+    def nbytes(self):
+        return self.log_returns.nbytes + self.simple_returns.nbytes + self.cov.nbytes
+
+    def weight_vector(self, weights: dict):
+        '''
+        weights dict as a vector in the model's ticker order (missing tickers get 0)
+        '''
+        return np.array([weights.get(ticker, 0.0) for ticker in self.tickers])
+
+    @timed('compute.portfolio_risk')
+    def risk(self, weights):
+        '''
+        portfolio volatility and how much each holding adds to it.
+
+        inputs:
+        weights: dict of {ticker: weight} or a vector in ticker order
+
+        returns:
+        (portfolio_vol, DataFrame indexed by ticker with weight, volatility, marginal
+        (d vol / d weight), component (weight x marginal, these add up to portfolio_vol)
+        and risk_pct (component / portfolio_vol))
+        '''
+        w = self.weight_vector(weights) if isinstance(weights, dict) else np.asarray(weights, dtype=float)
+
+        cov_w = self.cov @ w
+        portfolio_vol = float(np.sqrt(w @ cov_w))
+        marginal = cov_w / portfolio_vol if portfolio_vol > 0 else np.zeros_like(w)
+        component = w * marginal
+
+        df = pd.DataFrame({
+            'weight': w,
+            'volatility': self.vols,
+            'marginal': marginal,
+            'component': component,
+            'risk_pct': component / portfolio_vol if portfolio_vol > 0 else np.zeros_like(w),
+        }, index=pd.Index(self.tickers, name='Ticker'))
+        return portfolio_vol, df
+
+    def returns(self, weights):
+        '''
+        the portfolio's past daily simple returns at these weights (rebalanced daily)
+        '''
+        w = self.weight_vector(weights) if isinstance(weights, dict) else np.asarray(weights, dtype=float)
+        return self.simple_returns @ w
+
+    def value_at_risk(self, weights, confidence: float = 0.95, horizon_days: int = 1):
+        '''
+        historical VaR and expected shortfall (average loss beyond the VaR), as positive fractions
+        of the portfolio's value. longer horizons use the portfolio's overlapping horizon_days
+        returns (compounded from the daily ones), so the VaR is the loss that confidence of the
+        past horizon_days periods stayed under.
+
+        returns:
+        (var, expected_shortfall)
+        '''
+        portfolio_returns = self.returns(weights)
+        if horizon_days > 1:
+            if len(portfolio_returns) < horizon_days:
+                raise ValueError(f"Not enough history for a {horizon_days}-day VaR")
+            growth = np.r_[0.0, np.cumsum(np.log1p(portfolio_returns))]
+            portfolio_returns = np.expm1(growth[horizon_days:] - growth[:-horizon_days])
+
+        cutoff = np.quantile(portfolio_returns, 1 - confidence)
+        tail = portfolio_returns[portfolio_returns <= cutoff]
+        return float(-cutoff), float(-tail.mean())
+
+    def diversification_ratio(self, weights):
+        '''
+        weighted average of the holdings' volatilities over the portfolio volatility.
+        1 means no diversification at all, higher is better
+        '''
+        w = self.weight_vector(weights) if isinstance(weights, dict) else np.asarray(weights, dtype=float)
+        portfolio_vol = np.sqrt(w @ self.cov @ w)
+        return float(np.abs(w) @ self.vols / portfolio_vol) if portfolio_vol > 0 else np.nan
+
+
+def get_portfolio_risk(tickers, period: str = '2y', trading_days: int = 252):
+    '''
+    PortfolioRisk for a set of tickers over period, fetched in parallel (fetch_many) and cached
+    in DATA_CACHE until the next close, so changing weights never refetches or rebuilds it.
+    raises ValueError naming the tickers that have no data.
+    '''
+    tickers = tuple(sorted(set(t.upper() for t in tickers)))
+
+    def load():
+        frames = fetch_many(tickers, period=period, interval='1d')
+        missing = [ticker for ticker, df in frames.items() if df.empty]
+        if missing:
+            raise ValueError(f"No data found for: {', '.join(missing)}")
+
+        dates, columns, closes = align_closes(frames)
+        return PortfolioRisk(closes, columns, dates=dates, trading_days=trading_days)
+
+    return DATA_CACHE.get_or_load(('portfolio', tickers, period, trading_days), load, expiry=lambda: expires_at('1d'))
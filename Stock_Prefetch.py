@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Stock_Functions import get_history, get_volatility_engine, get_interval_bars
+
+# interval order on the chart page, used to find the "neighbouring" intervals
+INTERVALS = ['1m', '1h', '1d', '1wk', '1mo']
+
+
+class Prefetcher:
+    '''
+    warms the data cache in the background for views a user is likely to open next.
+    jobs run on a small shared thread pool, and each owner (a session) only has one batch
+    going at a time: scheduling a new batch cancels whatever the owner still had queued,
+    and jobs that were superseded while waiting skip themselves.
+
+    inputs:
+    max_workers: size of the thread pool, shared by every session
+    '''
+
+    def __init__(self, max_workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._batches = {}
+        # reentrant since a job that finishes fast runs its done callback (_forget) inside prefetch()
+        self._lock = threading.RLock()
+
+    def prefetch(self, owner, tasks):
+        '''
+        cancels owner's queued jobs and queues tasks (no-argument functions) instead
+        '''
+        batch = []
+        with self._lock:
+            self._cancel(owner)
+            self._batches[owner] = batch
+            for task in tasks:
+                future = self._pool.submit(self._run, owner, batch, task)
+                future.add_done_callback(lambda _, owner=owner, batch=batch: self._forget(owner, batch))
+                batch.append(future)
+
+    def cancel(self, owner):
+        with self._lock:
+            self._cancel(owner)
+
+    def _cancel(self, owner):
+        # caller holds the lock
+        for future in self._batches.pop(owner, []):
+            future.cancel()
+
+    def _run(self, owner, batch, task):
+        # skip jobs from a batch that was replaced while they were still queued
+        if self._batches.get(owner) is not batch:
+            return
+
+        try:
+            task()
+        except Exception:
+            # best effort, the page will fetch (and report errors) itself if it needs the data
+            pass
+
+    def _forget(self, owner, batch):
+        with self._lock:
+            if self._batches.get(owner) is batch and all(f.done() for f in batch):
+                del self._batches[owner]
+
+
+PREFETCHER = Prefetcher()
+
+
+def prefetch_next_views(owner, symbol: str, interval: str, compare_ticker: str = "SPY"):
+    '''
+    after a ticker change, warms what the user usually opens next:
+    - the Performance & Volatility page (full daily history + volatility engine)
+    - the Compare page (the comparison ticker at the same interval)
+    - the neighbouring intervals on the chart page
+
+    owner: anything identifying the session, its previous prefetch gets cancelled
+    '''
+    symbol = symbol.upper()
+    tasks = [
+        lambda: get_volatility_engine(symbol),
+        lambda: get_history(compare_ticker, interval=interval),
+    ]
+
+    i = INTERVALS.index(interval) if interval in INTERVALS else 2
+    for neighbour in INTERVALS[max(i - 1, 0):i + 2]:
+        if neighbour != interval:
+            tasks.append(lambda neighbour=neighbour: get_interval_bars(symbol, neighbour))
+
+    PREFETCHER.prefetch(owner, tasks)
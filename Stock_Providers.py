@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import random
+import threading
+
+import pandas as pd
+
+from Stock_Cache import SingleFlight
+
+
+class DataProvider:
+    '''
+    where price data comes from. Stock_Functions only ever talks to one of these (see
+    get_provider), so the upstream can be swapped without touching the app:
+    - YahooProvider: live data from yahoo finance (the default)
+    - ReplayProvider: histories read back from files, for offline load testing and CI
+    '''
+
+    name = 'base'
+
+    def history(self, symbol: str, interval: str = '1d', period: str = 'max', start=None):
+        '''
+        OHLCV history for a ticker. start (a timestamp) asks for only the bars from start
+        onwards and wins over period. unknown tickers give an empty DataFrame.
+        '''
+        raise NotImplementedError
+
+    def info(self, symbol: str) -> dict:
+        raise NotImplementedError
+
+
+class YahooProvider(DataProvider):
+    '''
+    live data through yfinance. yfinance is imported on the first request, not at startup
+    '''
+
+    name = 'yahoo'
+
+    def history(self, symbol: str, interval: str = '1d', period: str = 'max', start=None):
+        import yfinance as yf
+
+        stock = yf.Ticker(symbol)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period, interval=interval)
+
+    def info(self, symbol: str) -> dict:
+        import yfinance as yf
+
+        return yf.Ticker(symbol).info
+
+
+class ReplayProvider(DataProvider):
+    '''
+    serves histories out of a folder of files instead of the network, for offline load tests
+    and CI. files are named like the on-disk store (SYMBOL_INTERVAL.parquet, or .csv), so a
+    copy of .stock_store/ works as-is. info comes from SYMBOL_info.json if it exists.
+
+    inputs:
+    directory: folder holding the files
+    latency: seconds to sleep per call, to mimic a real upstream under load
+    '''
+
+    name = 'replay'
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def _path(self, symbol: str, suffix: str):
+        return os.path.join(self.directory, f"{symbol.upper()}_{suffix}")
+
+    def history(self, symbol: str, interval: str = '1d', period: str = 'max', start=None):
+        # period isn't applied, callers get the whole recorded history and slice it themselves
+        if self.latency:
+            time.sleep(self.latency)
+
+        parquet_path = self._path(symbol, f"{interval}.parquet")
+        csv_path = self._path(symbol, f"{interval}.csv")
+        if os.path.exists(parquet_path):
+            df = pd.read_parquet(parquet_path)
+        elif os.path.exists(csv_path):
+            df = pd.read_csv(csv_path, index_col=0)
+            df.index = pd.to_datetime(df.index, utc=True).tz_convert('America/New_York')
+        else:
+            return pd.DataFrame()
+
+        if start is not None:
+            df = df.iloc[df.index.searchsorted(pd.Timestamp(start)):]
+        return df
+
+    def info(self, symbol: str) -> dict:
+        try:
+            with open(self._path(symbol, "info.json")) as f:
+                return json.load(f)
+        except OSError:
+            return {'symbol': symbol.upper()}
+
+
+class TokenBucket:
+    '''
+    token-bucket rate limiter. allows bursts of up to capacity calls, then rate calls per second.
+    acquire() blocks until a token is free.
+    '''
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class ManagedProvider(DataProvider):
+    '''
+    wraps another provider with everything needed to be polite to the upstream:
+    - single-flight: one in-flight request per (call, args) key, concurrent callers share it
+    - a token bucket capping the request rate
+    - retries with exponential backoff (plus jitter) when a request raises
+
+    inputs:
+    inner: the provider doing the real work
+    rate, burst: token bucket refill rate (requests/second) and burst size
+    attempts: tries per request before the error is passed on
+    backoff: delay before the first retry in seconds, doubled every retry
+    '''
+
+    def __init__(self, inner: DataProvider, rate: float = 5.0, burst: int = 50, attempts: int = 3, backoff: float = 0.5):
+        self.inner = inner
+        self.name = inner.name
+        self.attempts = attempts
+        self.backoff = backoff
+        self._bucket = TokenBucket(rate, burst)
+        self._flight = SingleFlight()
+
+    def _call(self, fn, *args, **kwargs):
+        for attempt in range(self.attempts):
+            self._bucket.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                if attempt == self.attempts - 1:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    def history(self, symbol: str, interval: str = '1d', period: str = 'max', start=None):
+        key = ('history', symbol, interval, period, None if start is None else str(start))
+        return self._flight.do(key, lambda: self._call(self.inner.history, symbol, interval=interval, period=period, start=start))
+
+    def info(self, symbol: str) -> dict:
+        return self._flight.do(('info', symbol), lambda: self._call(self.inner.info, symbol))
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> DataProvider:
+    '''
+    the provider the app fetches through, built on first use from env vars:
+    STOCK_PROVIDER ('yahoo' or 'replay'), STOCK_REPLAY_DIR, STOCK_REPLAY_LATENCY,
+    STOCK_RATE_LIMIT (requests/second) and STOCK_RATE_BURST
+    '''
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if os.environ.get("STOCK_PROVIDER", "yahoo") == "replay":
+                inner = ReplayProvider(
+                    os.environ.get("STOCK_REPLAY_DIR", "replay_data"),
+                    latency=float(os.environ.get("STOCK_REPLAY_LATENCY", 0)),
+                )
+            else:
+                inner = YahooProvider()
+
+            _provider = ManagedProvider(
+                inner,
+                rate=float(os.environ.get("STOCK_RATE_LIMIT", 5)),
+                burst=int(os.environ.get("STOCK_RATE_BURST", 50)),
+            )
+
+        return _provider
+
+
+def set_provider(provider: DataProvider):
+    '''
+    swaps the provider at runtime (benchmarks, tests, scripts)
+    '''
+    global _provider
+    with _provider_lock:
+        _provider = provider
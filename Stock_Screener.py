@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+from Stock_Cache import expires_at
+from Stock_Functions import DATA_CACHE, fetch_many
+from Stock_Metrics import timed
+
+# what the screener page starts out with: the big index ETFs, the sector SPDRs and the largest names
+DEFAULT_UNIVERSE = [
+    'SPY', 'QQQ', 'DIA', 'IWM',
+    'XLB', 'XLC', 'XLE', 'XLF', 'XLI', 'XLK', 'XLP', 'XLRE', 'XLU', 'XLV', 'XLY',
+    'AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA', 'BRK-B', 'JPM', 'V',
+    'UNH', 'XOM', 'JNJ', 'WMT', 'MA', 'PG', 'HD', 'COST', 'AVGO', 'NFLX',
+]
+
+
+def parse_tickers(text: str):
+    '''
+    tickers out of free text: commas, spaces or new lines between them, '#' starts a comment
+    '''
+    tickers = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0]
+        tickers += [t.strip().upper() for t in line.replace(',', ' ').split() if t.strip()]
+    return list(dict.fromkeys(tickers))
+
+
+class Panel:
+    '''
+    daily closes and volumes of a whole universe as two tickers x dates NumPy matrices on one
+    shared date axis. a ticker missing a day (not listed yet, halted...) has NaN there.
+    every screener metric is a single pass over these matrices, never a loop over tickers.
+
+    inputs:
+    dates: DatetimeIndex shared by every row
+    tickers: list of tickers, one per row
+    close, volume: 2D float arrays, shape (len(tickers), len(dates))
+    '''
+
+    def __init__(self, dates, tickers, close, volume):
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.close = close
+        self.volume = volume
+
+    @property
+    def nbytes(self):
+        return self.close.nbytes + self.volume.nbytes + self.dates.nbytes
+
+    def row(self, ticker: str):
+        return self.tickers.index(ticker)
+
+
+def build_panel(frames: dict):
+    '''
+    lines up a dict of {ticker: daily OHLCV DataFrame} on the union of their dates.
+    empty frames are left out.
+    '''
+    frames = {ticker: df for ticker, df in frames.items() if not df.empty}
+    if not frames:
+        return Panel(pd.DatetimeIndex([]), [], np.empty((0, 0)), np.empty((0, 0)))
+
+    # one calendar for everyone (trading days, without the time of day or timezone). most
+    # tickers share the exact same index, so each distinct one is only converted once
+    calendars = {}
+    distinct = []
+    days = {}
+    for ticker, df in frames.items():
+        stamps = df.index.asi8
+        key = (len(stamps), stamps[0], stamps[-1])
+        known = calendars.get(key)
+        if known is None or not np.array_equal(known[0], stamps):
+            index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+            known = calendars[key] = (stamps, index.normalize().to_numpy())
+            distinct.append(known)
+        days[ticker] = known
+
+    dates = pd.DatetimeIndex(np.unique(np.concatenate([day for _, day in distinct])))
+    columns = {id(known): dates.searchsorted(known[1]) for known in distinct}
+
+    close = np.full((len(frames), len(dates)), np.nan)
+    volume = np.full((len(frames), len(dates)), np.nan)
+    for i, (ticker, df) in enumerate(frames.items()):
+        positions = columns[id(days[ticker])]
+        close[i, positions] = df['Close'].to_numpy(dtype=float)
+        volume[i, positions] = df['Volume'].to_numpy(dtype=float)
+
+    return Panel(dates, list(frames), close, volume)
+
+
+def load_panel(symbols, period: str = '1y'):
+    '''
+    daily Panel for a universe, downloaded in parallel (fetch_many) and cached in DATA_CACHE
+    until the next session close. tickers with no data are dropped.
+    the histories are read from the store and cut to period without being cached, so only the
+    compact Panel lands in DATA_CACHE. a universe of thousands of tickers would otherwise evict
+    everything other sessions are using.
+    '''
+    symbols = tuple(sorted(set(s.upper() for s in symbols)))
+
+    def load():
+        return build_panel(fetch_many(symbols, period=period, interval='1d', cache=False))
+
+    return DATA_CACHE.get_or_load(('panel', symbols, period), load, expiry=lambda: expires_at('1d'))
+
+
+def forward_fill(values):
+    '''
+    carries the last valid value forward along each row (dates axis). leading NaNs stay NaN.
+    '''
+    n_dates = values.shape[1]
+    positions = np.where(np.isfinite(values), np.arange(n_dates), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    return np.take_along_axis(values, positions, axis=1)
+
+
+def first_valid(values):
+    '''
+    the first non-NaN value of every row (NaN for an all-NaN row)
+    '''
+    valid = np.isfinite(values)
+    first = np.take_along_axis(values, valid.argmax(axis=1)[:, None], axis=1)[:, 0]
+    return np.where(valid.any(axis=1), first, np.nan)
+
+
+def nan_mean(values):
+    '''
+    mean of every row, skipping NaNs (NaN for a row with no values)
+    '''
+    valid = np.isfinite(values)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, np.where(valid, values, 0.0).sum(axis=1) / n, np.nan)
+
+
+def nan_var(values):
+    '''
+    sample variance (ddof=1) of every row, skipping NaNs (NaN for rows with under 2 values)
+    '''
+    valid = np.isfinite(values)
+    x = np.where(valid, values, 0.0)
+    n = valid.sum(axis=1)
+    s, s_sq = x.sum(axis=1), (x * x).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (s_sq - s * s / n) / (n - 1)
+    return np.where(n > 1, np.maximum(var, 0.0), np.nan)
+
+
+def row_corr(x, y):
+    '''
+    correlation of every row of x with the 1D series y, over the dates where both have a value
+    '''
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    n = valid.sum(axis=1)
+
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, syy, sxy = (x * x).sum(axis=1), (y * y).sum(axis=1), (x * y).sum(axis=1)
+
+    cov = n * sxy - sx * sy
+    var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((n > 2) & (var > 0), cov / np.sqrt(var), np.nan)
+
+
+@timed('compute.screen')
+def screen(panel: Panel, benchmark: str = 'SPY', vol_window: int = 30, volume_window: int = 20, trading_days: int = 252):
+    '''
+    ranks-ready metrics for every ticker of a Panel, each one a vectorized pass over the matrix:
+    - ytd_return_pct: % return since the first bar of the latest year (like the YTD chart period)
+    - volatility: annualized std of the last vol_window daily log returns
+    - max_drawdown_pct / drawdown_pct: worst and current % drop from the running peak
+    - corr_<benchmark>: correlation of daily returns with the benchmark (NaN if it isn't in the panel)
+    - avg_volume: mean daily volume over the last volume_window days
+
+    returns:
+    DataFrame indexed by ticker
+    '''
+    if not panel.tickers:
+        return pd.DataFrame()
+
+    close = forward_fill(panel.close)
+    last_close = close[:, -1]
+
+    # YTD, from the first bar each ticker has in the latest calendar year
+    ytd_start = panel.dates.searchsorted(pd.Timestamp(year=panel.dates[-1].year, month=1, day=1))
+    ytd_return = (last_close / first_valid(panel.close[:, ytd_start:]) - 1) * 100
+
+    # daily log returns. forward filled gaps count as a flat day
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_return = np.diff(np.log(close), axis=1)
+
+    # drawdown from the running peak (fmax/fmin skip the NaNs before a ticker's first bar)
+    drawdown = (close / np.fmax.accumulate(close, axis=1) - 1) * 100
+
+    columns = {
+        'last_close': last_close,
+        'ytd_return_pct': ytd_return,
+        'volatility': np.sqrt(nan_var(log_return[:, -vol_window:]) * trading_days),
+        'max_drawdown_pct': np.fmin.reduce(drawdown, axis=1),
+        'drawdown_pct': drawdown[:, -1],
+    }
+    if benchmark in panel.tickers:
+        columns[f'corr_{benchmark}'] = row_corr(log_return, log_return[panel.row(benchmark)])
+    columns['avg_volume'] = nan_mean(panel.volume[:, -volume_window:])
+
+    return pd.DataFrame(columns, index=pd.Index(panel.tickers, name='Ticker'))
@@ -0,0 +1,104 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# one parquet file per ticker/interval lives in here. can be moved with the STOCK_STORE_DIR env var
+STORE_DIR = os.environ.get(
+    "STOCK_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".stock_store"),
+)
+
+
+def store_path(symbol: str, interval: str) -> str:
+    '''
+    path of the stored history for one ticker/interval
+    '''
+    safe_symbol = symbol.upper().replace("/", "_").replace(os.sep, "_")
+    return os.path.join(STORE_DIR, f"{safe_symbol}_{interval}.parquet")
+
+
+def load_history(symbol: str, interval: str):
+    '''
+    reads a stored OHLCV history from disk. the file is memory mapped, so a cold start
+    only pays for the pages pandas actually touches.
+
+    returns:
+    (df, age_seconds) or (None, None) if nothing usable is stored yet
+    '''
+    path = store_path(symbol, interval)
+    try:
+        df = pd.read_parquet(path, memory_map=True)
+        age = time.time() - os.path.getmtime(path)
+    except (OSError, ValueError):
+        # missing or half written/corrupt file. treat it like an empty store
+        return None, None
+
+    return df, age
+
+
+def save_history(symbol: str, interval: str, df: pd.DataFrame):
+    '''
+    writes a history to the store. goes through a temp file + rename so a reader
+    never sees a half written file.
+    '''
+    if df is None or df.empty:
+        return
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    path = store_path(symbol, interval)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def history_rebased(df_old: pd.DataFrame, df_new: pd.DataFrame) -> bool:
+    '''
+    True when yahoo has back-adjusted the whole history since df_old was stored, so the new
+    bars can't just be appended to it. that happens on a split (and, with adjusted prices,
+    on a dividend): a bar after the stored ones carries a split/dividend, or the re-fetched
+    last stored bar came back at a different price.
+
+    the overlap bar is compared on its Open rather than its Close, since the stored one may
+    have been partial and its Close was still moving. the Open is fixed once the bar starts,
+    and only changes when the history is re-adjusted.
+    '''
+    if df_old is None or df_old.empty or df_new is None or df_new.empty:
+        return False
+
+    last = df_old.index[-1]
+    for col in ('Stock Splits', 'Dividends'):
+        if col not in df_new.columns:
+            continue
+        events = df_new[col].fillna(0).to_numpy() != 0
+        stored = df_old[col].iloc[-1] if col in df_old.columns else 0
+        # a split/dividend on the overlap bar that was already stored with it isn't news
+        new_events = (df_new.index > last) | ((df_new.index == last) & (np.nan_to_num(stored) == 0))
+        if (events & new_events).any():
+            return True
+
+    if last in df_new.index and 'Open' in df_new.columns and 'Open' in df_old.columns:
+        old_open = float(df_old['Open'].iloc[-1])
+        new_open = float(df_new.loc[[last], 'Open'].iloc[-1])
+        if np.isfinite(old_open) and np.isfinite(new_open) and not np.isclose(old_open, new_open, rtol=1e-4):
+            return True
+
+    return False
+
+
+def merge_bars(df_old: pd.DataFrame, df_new: pd.DataFrame) -> pd.DataFrame:
+    '''
+    appends newly fetched bars to a stored history. overlapping timestamps keep the new
+    bar since the last stored bar may have been a partial (still trading) one.
+    '''
+    if df_old is None or df_old.empty:
+        return df_new
+    if df_new is None or df_new.empty:
+        return df_old
+
+    merged = pd.concat([df_old, df_new])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    if not merged.index.is_monotonic_increasing:
+        merged = merged.sort_index()
+
+    return merged
@@ -0,0 +1,61 @@
+import os
+import threading
+
+# tickers loaded into the data cache at boot, so the first sessions after a deploy don't all
+# start cold. STOCK_WARMUP turns it on: '1' uses this list, or give your own ("SPY,AAPL,TSLA")
+DEFAULT_WATCHLIST = ['SPY', 'QQQ', 'AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA']
+
+_started = False
+_lock = threading.Lock()
+
+
+def watchlist():
+    '''
+    the tickers STOCK_WARMUP asks for, empty when warm-up is off
+    '''
+    setting = os.environ.get("STOCK_WARMUP", "").strip()
+    if setting in ("", "0"):
+        return []
+    if setting == "1":
+        return list(DEFAULT_WATCHLIST)
+    return [s.strip().upper() for s in setting.split(",") if s.strip()]
+
+
+def warm_watchlist(symbols):
+    '''
+    loads the plotting libraries, then each ticker's daily/weekly/monthly bars and volatility
+    engine into DATA_CACHE. histories come out of the local store (Stock_Store.py), so only
+    the bars newer than the stored ones get downloaded. tickers that fail are skipped, the
+    pages will fetch them (and show the error) themselves.
+    '''
+    # imported here so the page calling start_warmup doesn't wait on pandas and friends
+    from Stock_Functions import preload_plotting, get_volatility_engine, get_interval_bars
+
+    preload_plotting()
+    for symbol in symbols:
+        try:
+            get_volatility_engine(symbol)
+            for interval in ('1wk', '1mo'):
+                get_interval_bars(symbol, interval)
+        except Exception:
+            pass
+
+
+def start_warmup():
+    '''
+    starts warm_watchlist on a background thread, once per server process.
+    safe to call from every page run, later calls do nothing.
+    '''
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+
+    symbols = watchlist()
+    if not symbols:
+        return None
+
+    thread = threading.Thread(target=warm_watchlist, args=(symbols,), name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,204 @@
+# benchmark suite for Stock_Functions. runs fully offline on synthetic data.
+#
+#   python benchmarks/run_benchmarks.py                         # 1k..1M rows of 1d and 1m bars, writes bench_results/<time>.json
+#   python benchmarks/run_benchmarks.py --sizes 1000 10000000 --intervals 1m   # up to 10M rows
+#   python benchmarks/run_benchmarks.py --compare bench_results/old.json
+#
+# compute and render paths are timed separately. wall time is the median of --repeats untraced
+# runs, then one extra run under tracemalloc gives peak memory and the allocations still alive
+# at the end of the call.
+import os
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from synthetic import synthetic_ohlcv, SyntheticProvider, SESSION_BARS, MAX_DAILY_ROWS
+
+import Stock_Store
+import Stock_Functions as sf
+from Stock_Providers import set_provider
+from Stock_Indicators import IndicatorEngine, INDICATOR_CHOICES
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench_results")
+
+
+def measure(fn, repeats: int):
+    '''
+    (median wall seconds, min wall seconds, peak bytes, live allocations) for fn()
+    '''
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return float(np.median(times)), min(times), peak, allocations
+
+
+def render(plot_fn, *args, **kwargs):
+    # full render path: build the figure, rasterize it like render_png does, close it
+    result = plot_fn(*args, **kwargs)
+    fig = result[0] if isinstance(result, tuple) else result
+    fig.savefig(io.BytesIO(), format='png', bbox_inches='tight', dpi=200)
+    plt.close(fig)
+
+
+def fetch_cases(rows: int, interval: str):
+    '''
+    get_stock_data with the store and cache cold, with only the on-disk store warm, and fully warm
+    '''
+    def cold():
+        sf.DATA_CACHE.clear()
+        shutil.rmtree(Stock_Store.STORE_DIR, ignore_errors=True)
+        sf.get_stock_data('BENCH', period='max', interval=interval)
+
+    def warm_store():
+        sf.DATA_CACHE.clear()
+        sf.get_stock_data('BENCH', period='max', interval=interval)
+
+    def warm_cache():
+        sf.get_stock_data('BENCH', period='max', interval=interval)
+
+    set_provider(SyntheticProvider(rows={interval: rows}))
+    return [('get_stock_data[cold]', cold), ('get_stock_data[store]', warm_store), ('get_stock_data[cache]', warm_cache)]
+
+
+def compute_cases(df, df_other):
+    return [
+        ('annual_returns', lambda: sf.annual_returns(df)),
+        ('historical_volatility', lambda: sf.VolatilityEngine(df['Close']).rolling(30)),
+        ('volatility_surface', lambda: sf.VolatilityEngine(df['Close']).surface()),
+        ('compare_returns', lambda: sf.compare_returns(df, df_other, 'A', 'B')),
+        ('indicators', lambda: IndicatorEngine(INDICATOR_CHOICES.values()).update(df).frame()),
+    ]
+
+
+def render_cases(df, df_other):
+    df_pct = sf.compare_returns(df, df_other, 'A', 'B')[0]
+    hv_series = sf.VolatilityEngine(df['Close']).rolling(30)
+    returns = sf.annual_returns(df)
+    overlays = IndicatorEngine(INDICATOR_CHOICES.values()).update(df).frame()
+    return [
+        ('stock_data_plot', lambda: render(sf.stock_data_plot, df, title='BENCH')),
+        ('stock_data_plot_overlays', lambda: render(sf.stock_data_plot, df, title='BENCH', overlays=overlays)),
+        ('volume_plot', lambda: render(sf.volume_plot, df)),
+        ('annual_performance_plot', lambda: render(sf.annual_performance_plot, returns)),
+        ('historical_volatility_plot', lambda: render(sf.historical_volatility_plot, hv_series)),
+        ('stock_compare_plot', lambda: render(sf.stock_compare_plot, df_pct, '1d')),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, intervals, repeats: int, skip_render: bool):
+    results = []
+    for interval in intervals:
+        for rows in sizes:
+            if interval not in SESSION_BARS and rows > MAX_DAILY_ROWS:
+                print(f"skipping {rows:,} {interval} rows (more than {MAX_DAILY_ROWS:,} daily bars)")
+                continue
+
+            df = synthetic_ohlcv(rows, interval, seed=1)
+            df_other = synthetic_ohlcv(rows, interval, seed=2)
+
+            cases = [('fetch', name, fn) for name, fn in fetch_cases(rows, interval)]
+            cases += [('compute', name, fn) for name, fn in compute_cases(df, df_other)]
+            if not skip_render:
+                cases += [('render', name, fn) for name, fn in render_cases(df, df_other)]
+
+            for stage, name, fn in cases:
+                wall, wall_min, peak, allocations = measure(fn, repeats)
+                results.append({
+                    'name': name,
+                    'stage': stage,
+                    'rows': rows,
+                    'interval': interval,
+                    'wall_s': wall,
+                    'wall_min_s': wall_min,
+                    'peak_bytes': peak,
+                    'allocations': allocations,
+                })
+                print(f"{stage:8} {name:28} {interval:>3} {rows:>10,} rows  {wall * 1000:10.2f} ms  peak {peak / 2**20:8.1f} MB  allocs {allocations:>8,}")
+
+    return results
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['rows'], r['interval']): r for r in json.load(f)['results']}
+
+    print(f"\nvs {baseline_path} (ratio > 1 means slower/bigger now)")
+    for r in results:
+        old = baseline.get((r['name'], r['rows'], r['interval']))
+        if old is None:
+            continue
+        wall_ratio = r['wall_s'] / old['wall_s'] if old['wall_s'] else float('nan')
+        peak_ratio = r['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else float('nan')
+        print(f"{r['name']:28} {r['interval']:>3} {r['rows']:>10,} rows  time x{wall_ratio:6.2f}  peak x{peak_ratio:6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Stock_Functions on synthetic OHLCV data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--intervals", nargs="+", default=["1d", "1m"], choices=["1m", "1h", "1d"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-render", action="store_true", help="only time the fetch/compute paths")
+    parser.add_argument("--out", help="results JSON path (default bench_results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    # keep the benchmark's store away from the real one
+    Stock_Store.STORE_DIR = tempfile.mkdtemp(prefix="stock_bench_")
+    try:
+        results = run(args.sizes, args.intervals, args.repeats, args.skip_render)
+    finally:
+        shutil.rmtree(Stock_Store.STORE_DIR, ignore_errors=True)
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'repeats': args.repeats,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"\nsaved {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
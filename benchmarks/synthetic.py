@@ -0,0 +1,104 @@
+# deterministic fake market data for the benchmarks, so they never touch the network
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Stock_Providers import DataProvider
+
+# bars per regular session and where they start, for the intraday intervals
+SESSION_BARS = {
+    '1m': (390, pd.Timedelta(minutes=1)),
+    '1h': (7, pd.Timedelta(hours=1)),
+}
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+
+# ~150 years of business days. longer daily histories would need dates matplotlib can't draw,
+# so the big sizes are only generated for intraday intervals
+MAX_DAILY_ROWS = 40_000
+
+
+def synthetic_index(n_rows: int, interval: str = '1d', end: str = '2025-12-31'):
+    '''
+    n_rows timestamps ending at end, laid out like yahoo's: weekdays only, and for intraday
+    intervals only inside the 9:30-16:00 session. built without any per-row python.
+    '''
+    if interval in SESSION_BARS:
+        per_day, step = SESSION_BARS[interval]
+        n_days = -(-n_rows // per_day)
+        days = pd.bdate_range(end=end, periods=n_days, tz='America/New_York')
+        offsets = SESSION_OPEN + step * np.arange(per_day)
+        index = days.repeat(per_day) + pd.TimedeltaIndex(np.tile(offsets, n_days))
+        return index[-n_rows:]
+
+    if n_rows > MAX_DAILY_ROWS:
+        raise ValueError(f"{n_rows:,} {interval} bars don't fit in a plottable date range, use an intraday interval")
+
+    freq = {'1d': 'B', '1wk': 'W-MON', '1mo': 'MS'}[interval]
+    return pd.date_range(end=end, periods=n_rows, freq=freq, tz='America/New_York')
+
+
+def synthetic_ohlcv(n_rows: int, interval: str = '1d', seed: int = 0, end: str = '2025-12-31'):
+    '''
+    geometric random walk OHLCV frame with yahoo's columns. the same (n_rows, interval, seed)
+    always gives the same frame.
+    '''
+    rng = np.random.default_rng(seed)
+    sigma = 0.015 if interval not in SESSION_BARS else 0.002
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, sigma, n_rows)))
+    open_ = close * np.exp(rng.normal(0, sigma / 3, n_rows))
+    spread = np.abs(rng.normal(0, sigma / 2, n_rows))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(100_000, 50_000_000, n_rows)
+
+    index = synthetic_index(n_rows, interval, end=end)
+    return pd.DataFrame(
+        {
+            'Open': open_,
+            'High': high,
+            'Low': low,
+            'Close': close,
+            'Volume': volume,
+            'Dividends': np.zeros(n_rows),
+            'Stock Splits': np.zeros(n_rows),
+        },
+        index=pd.DatetimeIndex(index, name='Date'),
+    )
+
+
+class SyntheticProvider(DataProvider):
+    '''
+    stand-in for yahoo that serves synthetic_ohlcv frames. every symbol gets its own fixed seed.
+
+    inputs:
+    rows: number of bars per interval, e.g. {'1d': 10_000, '1m': 2_000}. default 5,000
+    latency: seconds to sleep per call, to mimic a network round trip
+    '''
+
+    name = 'synthetic'
+
+    def __init__(self, rows: dict = None, latency: float = 0.0):
+        self.rows = rows or {}
+        self.latency = latency
+        self.calls = 0
+
+    def history(self, symbol: str, interval: str = '1d', period: str = 'max', start=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        df = synthetic_ohlcv(self.rows.get(interval, 5_000), interval, seed=zlib.crc32(symbol.encode()))
+        if start is not None:
+            df = df.iloc[df.index.searchsorted(pd.Timestamp(start)):]
+        return df
+
+    def info(self, symbol: str) -> dict:
+        self.calls += 1
+        return {'symbol': symbol, 'shortName': f"Synthetic {symbol}"}
@@ -1,5 +1,9 @@
 import streamlit as st
-from Stock_Functions import get_stock_data, stock_data_plot, volume_plot
+import uuid
+from Stock_Metrics import set_page_tags
+from Stock_Warmup import start_warmup
+
+start_warmup()
 
 st.set_page_config(layout="wide")
 st.title("Mediocre Stock App")
@@ -19,15 +23,18 @@ if 'interval' not in st.session_state:
     st.session_state['interval'] = '1d'
 if 'period' not in st.session_state:
     st.session_state['period'] = 'YTD'
-if 'df_rel' not in st.session_state:
-    st.session_state['df_rel'] = None
-if 'df_max' not in st.session_state:
-    st.session_state['df_max'] = None
+if 'frame_ref' not in st.session_state:
+    st.session_state['frame_ref'] = None
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = uuid.uuid4().hex
 
 # callback functions
 def update_ticker():
     st.session_state['last_fetched_ticker'] = st.session_state['ticker_input'].upper()
 
+    # start warming the other pages in the background while this one renders
+    prefetch_next_views(st.session_state['session_id'], st.session_state['last_fetched_ticker'], st.session_state['interval'])
+
 def update_interval():
     new_interval = st.session_state['interval_input']
     st.session_state['interval'] = new_interval
@@ -52,6 +59,7 @@ last_fetched_ticker = st.session_state['last_fetched_ticker']
 
 # valid periods per interval
 # this was cool to learn how to make 
+# 1d/1wk/1mo and all of their periods are cut out of the one cached daily history, only 1m/1h go to yahoo
 interval_options = {
     '1m': (['1d','1wk'], '1d'),
     '1h': (['1d','1wk','1mo','3mo','6mo','1y','YTD','5y','10y','max'], '1d'),
@@ -74,35 +82,71 @@ st.sidebar.selectbox("Period:", options, index=options.index(st.session_state['p
 interval = st.session_state['interval']
 period = st.session_state['period']
 
+# live mode: 1m charts that keep polling for new bars
+live_mode = interval == '1m' and st.sidebar.toggle("Live mode", key='live_mode', help="Polls for new 1m bars and redraws only the chart")
+
+# timings recorded below are tagged with what the user is looking at (only when STOCK_METRICS=1)
+set_page_tags(ticker=last_fetched_ticker, interval=interval, period=period)
 
 # loading message
 load_msg = st.empty()
 load_msg.write(f"Loading data for {last_fetched_ticker}, {interval}, {period}...")
 
-# fetch data
+# imported down here so the title and sidebar are already on screen while pandas loads on a cold start
+from Stock_Functions import get_history, stock_data_plot, volume_plot, render_png, frame_version, FrameRef
+from Stock_Prefetch import prefetch_next_views
+from Stock_Live import get_live_feed, LIVE_POLL_SECONDS
+from Stock_Indicators import INDICATOR_CHOICES, get_indicators
+
+# indicator overlays, computed once per ticker/interval/selection and shared by every session
+indicators = st.sidebar.multiselect("Indicators:", list(INDICATOR_CHOICES), key='indicators', disabled=live_mode)
+
+# fetch data. only the chart's own history is loaded here, the performance page loads df_max when it needs it.
+# the session only keeps a FrameRef (ticker, interval, period), the frame itself is shared by every session
 try:
-    df_rel, df_max, *_ = get_stock_data(symbol=last_fetched_ticker, period=period, interval=interval)
+    df_rel = get_history(symbol=last_fetched_ticker, period=period, interval=interval)
     if df_rel.empty:
         st.warning(f"No data found for ticker '{last_fetched_ticker}'. *Hint: tickers are often 3-5 capital letters with no space or numbers.")
-        st.session_state.pop('df_rel', None)
-        st.session_state.pop('df_max', None)
-    else:
-        st.session_state['df_rel'] = df_rel
-        st.session_state['df_max'] = df_max
+        st.session_state.pop('frame_ref', None)
+    elif st.session_state.get('frame_ref') is None or st.session_state['frame_ref'].key != (last_fetched_ticker, interval, period):
+        st.session_state['frame_ref'] = FrameRef(last_fetched_ticker, interval, period)
 except Exception as e:
     st.error(f"An error occurred while fetching data: {e}")
-    st.session_state.pop('df_rel', None)
-    st.session_state.pop('df_max', None)
+    st.session_state.pop('frame_ref', None)
 
 # clear messages
 load_msg.empty()
 temp_msg.empty()
 
-# plotting
-if 'df_rel' in st.session_state and not st.session_state['df_rel'].empty:
-    fig_stock = stock_data_plot(st.session_state['df_rel'], title=last_fetched_ticker)
-    fig_volume = volume_plot(st.session_state['df_rel'])
-    st.pyplot(fig_stock)
-    st.pyplot(fig_volume)
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_chart(symbol: str, period: str):
+    # reruns on its own timer without the rest of the page. the feed is shared by every session
+    # watching this ticker and each poll only downloads the bars after the last one
+    feed = get_live_feed(symbol, period)
+    new_bars = feed.poll()
+    df_live = feed.frame()
+    n_bars, last_close, std, var = feed.summary()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Last", f"{last_close:.2f}")
+    col2.metric("Bars", f"{n_bars}")
+    col3.metric("Std Dev", f"{std:.3f}")
+    col4.metric("Variance", f"{var:.3f}")
+
+    chart_key = ('live', symbol, period, frame_version(df_live))
+    st.image(render_png(('candle', *chart_key), stock_data_plot, df_live, title=f"{symbol} (live)"), width='stretch')
+    st.image(render_png(('volume', *chart_key), volume_plot, df_live), width='stretch')
+    st.caption(f"{new_bars} new bars, checks every {LIVE_POLL_SECONDS}s")
+
+
+# plotting. charts are cached as images, so a rerun with the same data skips rendering
+if st.session_state.get('frame_ref') is not None and live_mode:
+    live_chart(last_fetched_ticker, period)
+elif st.session_state.get('frame_ref') is not None:
+    chart_key = (last_fetched_ticker, interval, period, frame_version(df_rel))
+    specs = tuple(INDICATOR_CHOICES[label] for label in indicators)
+    overlays = get_indicators(last_fetched_ticker, interval, specs, df_rel) if specs else None
+    st.image(render_png(('candle', *chart_key, specs), stock_data_plot, df_rel, title=last_fetched_ticker, overlays=overlays), width='stretch')
+    st.image(render_png(('volume', *chart_key), volume_plot, df_rel), width='stretch')
 
 
@@ -1,5 +1,6 @@
 import streamlit as st
-from Stock_Functions import annual_performance, historical_volatility 
+from Stock_Functions import annual_returns, annual_performance_plot, historical_volatility_plot, get_max_daily, get_volatility_engine, render_png, frame_version
+from Stock_Metrics import set_page_tags
 
 
 st.set_page_config(layout="wide")
@@ -12,6 +13,7 @@ st.sidebar.header("Stock Options")
 
 # Define the variable from session state
 last_fetched_ticker = st.session_state['last_fetched_ticker']
+set_page_tags(ticker=last_fetched_ticker, interval='1d', period='max')
 
 # Display the ticker (read-only) so user can see what's loaded
 st.sidebar.text_input(
@@ -34,13 +36,14 @@ vol_window = st.sidebar.slider(
 st.sidebar.write(f"Data for Ticker: **{last_fetched_ticker}**")
 
 # check if data is ready
-data_is_ready = ('df_max' in st.session_state and 'df_rel' in st.session_state)
+data_is_ready = (st.session_state.get('frame_ref') is not None)
 
 if not data_is_ready:
     st.warning(f"No data loaded for ticker **{last_fetched_ticker}**. Please go to the main page to fetch data.")
 else:
-    df_rel = st.session_state['df_rel']
-    df_max = st.session_state['df_max']
+    # the full daily history is only downloaded once someone opens this page
+    with st.spinner(f"Loading full history for {last_fetched_ticker}..."):
+        df_max = get_max_daily(last_fetched_ticker)
 
     st.write(f"**Current Ticker:** {last_fetched_ticker}")
     st.write(f"**Volatility Window:** {vol_window} days")
@@ -51,8 +54,9 @@ else:
         if df_max.empty:
             st.warning("Not enough data to calculate annual performance.")
         else:
-            fig_perf, performance_results = annual_performance(df_max)
-            st.pyplot(fig_perf)
+            performance_results = annual_returns(df_max)
+            fig_perf = render_png(('annual', last_fetched_ticker, frame_version(performance_results)), annual_performance_plot, performance_results)
+            st.image(fig_perf, width='stretch')
     except Exception as e:
         st.error(f"Error calculating annual performance: {e}")
 
@@ -62,7 +66,16 @@ else:
         if df_max.empty or len(df_max) < vol_window:
             st.warning(f"Not enough data for a {vol_window}-day window.")
         else:
-            fig_vol, hv_series = historical_volatility(df_max, window=vol_window)
-            st.pyplot(fig_vol)
+            # the engine's running sums are built once per ticker, moving the slider just reads them
+            vol_engine = get_volatility_engine(last_fetched_ticker)
+            hv_series = vol_engine.rolling(vol_window)
+            fig_vol = render_png(('hv', last_fetched_ticker, vol_window, frame_version(hv_series)), historical_volatility_plot, hv_series, window=vol_window)
+            st.image(fig_vol, width='stretch')
+
+            # current volatility across a few common windows, all from the same engine
+            surface_windows = [w for w in (10, 30, 60, 90, 252) if w <= len(df_max)]
+            latest_vol = vol_engine.surface(surface_windows).iloc[-1]
+            st.write("**Current Volatility by Window:**")
+            st.dataframe(latest_vol.rename(lambda w: f"{w}-Day").to_frame("Annualized Volatility").T.style.format("{:.2%}"))
     except Exception as e:
         st.error(f"Error calculating historical volatility: {e}")
@@ -1,11 +1,12 @@
 import streamlit as st
-from Stock_Functions import stock_compare
+from Stock_Functions import get_range, frame_span, compare_returns, compare_basket, stock_compare_plot, render_png, frame_version, compare_rolling, rolling_stats_plot, ROLLING_WINDOWS
+from Stock_Metrics import set_page_tags
 
 st.title("Stock Comparison")
 st.sidebar.header("Comparison Options")
 
 # Check if data exists
-if 'df_rel' not in st.session_state or st.session_state['df_rel'] is None:
+if st.session_state.get('frame_ref') is None:
     st.warning("No stock data loaded. Please go to the main page and fetch data for a stock first.")
     st.stop()
 
@@ -21,30 +22,102 @@ if 'period' not in st.session_state:
 main_ticker = st.session_state['last_fetched_ticker']
 interval = st.session_state['interval']
 period = st.session_state['period']
-df_rel = st.session_state['df_rel']
+set_page_tags(ticker=main_ticker, interval=interval, period=period)
+df_rel = st.session_state['frame_ref'].resolve()
 
 # comparison ticker input
 st.sidebar.subheader("Compare Against")
-compare_ticker = st.sidebar.text_input("Comparison Ticker:", value="SPY",).upper()
+compare_mode = st.sidebar.radio("Mode:", ["Single Ticker", "Basket"], key='compare_mode')
+
+if compare_mode == "Basket":
+    basket_input = st.sidebar.text_input("Basket (comma separated):", value="SPY, QQQ, DIA, IWM", key='compare_basket')
+    compare_ticker = None
+else:
+    compare_ticker = st.sidebar.text_input("Comparison Ticker:", value="SPY",).upper()
+    rolling_window = st.sidebar.slider("Rolling window (bars):", min_value=5, max_value=252, value=ROLLING_WINDOWS.get(interval, 60), key=f'rolling_window_{interval}')
 
 st.sidebar.write(f"**Main Stock:** {main_ticker}")
 st.sidebar.write(f"**Interval:** {interval}")
 st.sidebar.write(f"**Period:** {period}")
 
+# any window of the main stock's cached history can be picked, it starts out as the main page's
+# period. zooming in or out only slices what's cached, nothing new gets downloaded
+df_full = get_range(main_ticker, interval)
+if len(df_rel) and len(df_full):
+    picked = st.sidebar.date_input(
+        "Date range:",
+        value=(df_rel.index[0].date(), df_rel.index[-1].date()),
+        min_value=df_full.index[0].date(),
+        max_value=df_full.index[-1].date(),
+        key=f'compare_range_{main_ticker}_{interval}_{period}',
+    )
+    # while only the first date has been clicked the range stays as it was
+    if len(picked) == 2:
+        df_rel = get_range(main_ticker, interval, *picked)
+
+if df_rel.empty:
+    st.warning("No data in the selected date range.")
+    st.stop()
+
+# basket mode: main stock vs every ticker in the basket at once
+if compare_mode == "Basket":
+    basket = [t.strip().upper() for t in basket_input.split(",") if t.strip()]
+    if not basket:
+        st.info("Enter one or more tickers to compare against.")
+        st.stop()
+
+    try:
+        with st.spinner(f"Comparing {main_ticker} vs {len(basket)} tickers..."):
+            df_pct, returns, corr = compare_basket(
+                df_1=df_rel,
+                interval=interval,
+                ticker_mem=main_ticker,
+                tickers_compare=basket
+            )
+            fig = render_png(('compare_basket', main_ticker, interval, period, *df_pct.columns, frame_version(df_pct)), stock_compare_plot, df_pct, interval, highlight=main_ticker)
+    except Exception as e:
+        st.error(f"Error comparing stocks: {e}")
+        st.stop()
+
+    st.image(fig, width='stretch')
+
+    st.subheader("Total Return")
+    st.dataframe(returns.sort_values(ascending=False).rename("Return (%)").round(2).to_frame())
+
+    st.subheader("Correlation Matrix")
+    st.dataframe(corr.round(3))
+
+    # tickers in the basket that move least with the main stock
+    least_correlated = corr[main_ticker].drop(main_ticker).sort_values()
+    st.subheader("Investment Insight")
+    st.write(f"Least correlated with **{main_ticker}**: " + ", ".join(f"**{t}** ({c:.3f})" for t, c in least_correlated.head(3).items()))
+    st.stop()
+
 # run comparison
 if compare_ticker:
     try:
         with st.spinner(f"Comparing {main_ticker} vs {compare_ticker}..."):
-            fig, df_pct, ret1, ret2, corr = stock_compare(
+            # exactly the main frame's dates, not the comparison ticker's whole history
+            df_compare = get_range(compare_ticker, interval, *frame_span(df_rel))
+            df_pct, ret1, ret2, corr = compare_returns(
                 df_1=df_rel,
-                interval=interval,
+                df_compare=df_compare,
                 ticker_mem=st.session_state['last_fetched_ticker'],
                 ticker_compare=compare_ticker
             )
+            fig = render_png(('compare_single', interval, period, *df_pct.columns, frame_version(df_pct)), stock_compare_plot, df_pct, interval)
         
         # Display the plot
-        st.pyplot(fig)
-        
+        st.image(fig, width='stretch')
+
+        # rolling correlation / beta / tracking error under it, so changes in the relationship show up
+        df_stats = compare_rolling(df_pct, interval, main_ticker, compare_ticker, window=rolling_window)
+        if df_stats.empty:
+            st.info(f"Not enough history for a {rolling_window}-bar rolling window.")
+        else:
+            st.image(render_png(('rolling', main_ticker, compare_ticker, interval, period, rolling_window, frame_version(df_stats)),
+                                rolling_stats_plot, df_stats, rolling_window, main_ticker, compare_ticker), width='stretch')
+
         # Analysis section
         st.subheader("Performance Analysis")
         
@@ -59,6 +132,14 @@ if compare_ticker:
         
         with col3:
             st.metric(label="Correlation", value=f"{corr:.3f}", delta=None)
+
+        # latest values of the rolling window
+        if not df_stats.empty:
+            latest = df_stats.iloc[-1]
+            col4, col5, col6 = st.columns(3)
+            col4.metric(label=f"{rolling_window}-Bar Correlation", value=f"{latest['corr']:.3f}")
+            col5.metric(label=f"Beta vs {compare_ticker}", value=f"{latest['beta']:.2f}")
+            col6.metric(label="Tracking Error", value=f"{latest['tracking_error']:.2%}")
         
         st.subheader("What This Means")
         
@@ -93,6 +174,7 @@ if compare_ticker:
             st.success(f"These stocks could provide **good diversification** in a portfolio due to their low correlation ({corr:.3f}).")
         else:
             st.info(f"These stocks tend to move together (correlation: {corr:.3f}), so they may not provide significant diversification benefits.")
+        st.caption("One pair only tells part of the story. The Portfolio Risk page shows how a whole weighted portfolio diversifies.")
         
     except Exception as e:
         st.error(f"Error comparing stocks")
@@ -0,0 +1,66 @@
+import streamlit as st
+import pandas as pd
+import Stock_Metrics
+from Stock_Metrics import REGISTRY
+from Stock_Functions import cache_stats
+
+st.set_page_config(layout="wide")
+st.title("Admin: Timings")
+
+if not Stock_Metrics.ENABLED:
+    st.info("Timing metrics are off. Start the app with STOCK_METRICS=1 to record them.")
+    st.stop()
+
+rows = REGISTRY.snapshot()
+if not rows:
+    st.write("Nothing recorded yet, open a few pages first.")
+    st.stop()
+
+df = pd.DataFrame(rows)
+
+# sidebar filters
+st.sidebar.header("Filters")
+stages = st.sidebar.multiselect("Stage:", sorted(df['stage'].unique()))
+tickers = st.sidebar.multiselect("Ticker:", sorted(t for t in df['ticker'].unique() if t))
+by_ticker = st.sidebar.checkbox("Split by ticker/interval/period", value=False)
+
+if stages:
+    df = df[df['stage'].isin(stages)]
+if tickers:
+    df = df[df['ticker'].isin(tickers)]
+
+# seconds to ms for display
+timing_cols = ['mean_s', 'p50_s', 'p95_s', 'p99_s', 'max_s']
+df[timing_cols] = df[timing_cols] * 1000
+df = df.rename(columns={col: col.replace('_s', ' (ms)') for col in timing_cols}).rename(columns={'total_s': 'total (s)'})
+
+if not by_ticker:
+    # one line per stage and cache hit/miss. the percentiles can't be merged across series,
+    # so the worst series' value is shown
+    df = df.groupby(['stage', 'cache'], as_index=False).agg({
+        'count': 'sum',
+        'total (s)': 'sum',
+        'p50 (ms)': 'max',
+        'p95 (ms)': 'max',
+        'p99 (ms)': 'max',
+        'max (ms)': 'max',
+    })
+    df.insert(3, 'mean (ms)', df['total (s)'] / df['count'] * 1000)
+
+st.subheader("Stage timings")
+st.dataframe(df.sort_values('total (s)', ascending=False), hide_index=True, width='stretch')
+
+# where the time went overall, by stage family (fetch / data / compute / render)
+family = df.assign(family=df['stage'].str.split('.').str[0]).groupby('family')['total (s)'].sum()
+st.bar_chart(family)
+
+st.subheader("Caches")
+st.dataframe(pd.DataFrame(cache_stats()).T, width='stretch')
+
+col_1, col_2 = st.columns(2)
+with col_1:
+    st.download_button("Download Prometheus metrics", REGISTRY.prometheus_text(), file_name="stock_app.prom", mime="text/plain")
+with col_2:
+    if st.button("Reset timings"):
+        REGISTRY.clear()
+        st.rerun()
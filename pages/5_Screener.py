@@ -0,0 +1,70 @@
+import streamlit as st
+import time
+from Stock_Screener import DEFAULT_UNIVERSE, parse_tickers, load_panel, screen
+
+st.set_page_config(layout="wide")
+st.title("Screener")
+st.sidebar.header("Screener Options")
+
+# universe: typed in, or a text/csv file of tickers (one per line or comma separated)
+universe_text = st.sidebar.text_area("Tickers:", value=", ".join(DEFAULT_UNIVERSE), height=150, key='screener_universe')
+universe_file = st.sidebar.file_uploader("...or a ticker list file:", type=['txt', 'csv'])
+
+benchmark = st.sidebar.text_input("Benchmark:", value="SPY", key='screener_benchmark').upper()
+lookback = st.sidebar.selectbox("Lookback:", ['1y', '2y', '5y', '10y'], key='screener_lookback')
+vol_window = st.sidebar.slider("Volatility window (days):", min_value=5, max_value=252, value=30, key='screener_vol_window')
+
+if universe_file is not None:
+    tickers = parse_tickers(universe_file.getvalue().decode(errors='ignore'))
+else:
+    tickers = parse_tickers(universe_text)
+
+if not tickers:
+    st.warning("Enter at least one ticker to screen.")
+    st.stop()
+
+# the benchmark always rides along so the correlation column can be filled in
+with st.spinner(f"Loading {len(tickers)} tickers..."):
+    panel = load_panel(tickers + [benchmark], period=lookback)
+
+missing = [t for t in tickers if t not in panel.tickers]
+if missing:
+    st.warning(f"No data found for: {', '.join(missing)}")
+if not panel.tickers:
+    st.stop()
+
+start = time.perf_counter()
+df = screen(panel, benchmark=benchmark, vol_window=vol_window)
+elapsed = time.perf_counter() - start
+
+# only list what was asked for, the benchmark was added for the correlation
+if benchmark not in tickers:
+    df = df.drop(index=benchmark, errors='ignore')
+
+st.caption(f"Screened {len(df)} tickers over {len(panel.dates)} days in {elapsed * 1000:.0f} ms. Click a column header to sort.")
+
+corr_col = f'corr_{benchmark}'
+st.dataframe(
+    df.sort_values('ytd_return_pct', ascending=False),
+    width='stretch',
+    height=min(36 * (len(df) + 1), 800),
+    column_config={
+        'last_close': st.column_config.NumberColumn("Last Close", format="%.2f"),
+        'ytd_return_pct': st.column_config.NumberColumn("YTD Return", format="%.2f%%"),
+        'volatility': st.column_config.NumberColumn(f"{vol_window}-Day Volatility", format="percent"),
+        'max_drawdown_pct': st.column_config.NumberColumn(f"Max Drawdown ({lookback})", format="%.2f%%"),
+        'drawdown_pct': st.column_config.NumberColumn("Off Peak", format="%.2f%%"),
+        corr_col: st.column_config.NumberColumn(f"Correlation to {benchmark}", format="%.2f"),
+        'avg_volume': st.column_config.NumberColumn("Avg Volume (20d)", format="compact"),
+    },
+)
+
+# insights, same idea as the compare page
+ytd = df['ytd_return_pct'].dropna()
+vol = df['volatility'].dropna()
+if len(ytd) > 1 and len(vol) > 1:
+    st.write(f"**Best YTD:** {ytd.idxmax()} ({ytd.max():.2f}%)  \n"
+             f"**Lowest volatility:** {vol.idxmin()} ({vol.min():.2%})")
+if corr_col in df.columns and df[corr_col].notna().any():
+    corr = df[corr_col].dropna()
+    st.write(f"**Least correlated with {benchmark}:** {corr.idxmin()} ({corr.min():.2f})")
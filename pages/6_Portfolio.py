@@ -0,0 +1,70 @@
+import streamlit as st
+from Stock_Portfolio import DEFAULT_HOLDINGS, parse_holdings, get_portfolio_risk
+
+st.set_page_config(layout="wide")
+st.title("Portfolio Risk")
+st.sidebar.header("Portfolio Options")
+
+# holdings, one per line: ticker and weight (weights are scaled to add up to 100%)
+holdings_text = st.sidebar.text_area("Holdings (ticker weight):", value=DEFAULT_HOLDINGS, height=300, key='portfolio_holdings')
+lookback = st.sidebar.selectbox("History:", ['1y', '2y', '5y', '10y'], index=1, key='portfolio_lookback')
+confidence = st.sidebar.selectbox("VaR confidence:", [0.95, 0.99], format_func=lambda c: f"{c:.0%}", key='portfolio_confidence')
+horizon = st.sidebar.selectbox("VaR horizon (days):", [1, 5, 10, 21], key='portfolio_horizon')
+portfolio_value = st.sidebar.number_input("Portfolio value ($):", min_value=0.0, value=100000.0, step=1000.0, key='portfolio_value')
+
+try:
+    weights = parse_holdings(holdings_text)
+except ValueError as e:
+    st.error(f"Couldn't read the holdings: {e}")
+    st.stop()
+
+if len(weights) < 2:
+    st.warning("Enter at least two holdings.")
+    st.stop()
+
+# the risk model only depends on the tickers, so editing weights reuses it
+try:
+    with st.spinner(f"Loading {len(weights)} holdings..."):
+        model = get_portfolio_risk(list(weights), period=lookback)
+except Exception as e:
+    st.error(f"Error building the portfolio: {e}")
+    st.stop()
+
+portfolio_vol, df_risk = model.risk(weights)
+var, shortfall = model.value_at_risk(weights, confidence=confidence, horizon_days=horizon)
+diversification = model.diversification_ratio(weights)
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Volatility (annualized)", f"{portfolio_vol:.2%}")
+col2.metric(f"{horizon}-Day VaR ({confidence:.0%})", f"{var:.2%}", f"-${var * portfolio_value:,.0f}", delta_color="off")
+col3.metric("Expected Shortfall", f"{shortfall:.2%}", f"-${shortfall * portfolio_value:,.0f}", delta_color="off")
+col4.metric("Diversification Ratio", f"{diversification:.2f}")
+
+st.caption(f"{len(model.dates) - 1} days of history, {model.dates[0].date()} to {model.dates[-1].date()}. "
+           f"VaR is historical: the loss that {confidence:.0%} of past (overlapping) {horizon}-day periods stayed under.")
+
+st.subheader("Risk Contribution")
+st.bar_chart(df_risk['risk_pct'].sort_values(ascending=False) * 100, y_label="% of portfolio risk")
+
+st.dataframe(
+    df_risk.sort_values('risk_pct', ascending=False),
+    width='stretch',
+    column_config={
+        'weight': st.column_config.NumberColumn("Weight", format="percent"),
+        'volatility': st.column_config.NumberColumn("Volatility", format="percent"),
+        'marginal': st.column_config.NumberColumn("Marginal Risk", format="%.3f", help="Change in portfolio vol per unit of weight"),
+        'component': st.column_config.NumberColumn("Component Risk", format="percent", help="Adds up to the portfolio volatility"),
+        'risk_pct': st.column_config.NumberColumn("% of Risk", format="percent"),
+    },
+)
+
+# holdings whose share of the risk is well above their share of the money
+st.subheader("Investment Insight")
+heavy = df_risk[df_risk['risk_pct'] > 1.5 * df_risk['weight']].sort_values('risk_pct', ascending=False)
+if diversification < 1.2:
+    st.info(f"The holdings tend to move together (diversification ratio {diversification:.2f}), so spreading money across them doesn't cut much risk.")
+else:
+    st.success(f"The holdings offset each other well (diversification ratio {diversification:.2f}): the portfolio is less volatile than its parts.")
+if not heavy.empty:
+    st.write("Carrying more risk than their weight: " + ", ".join(
+        f"**{t}** ({row['weight']:.1%} of the money, {row['risk_pct']:.1%} of the risk)" for t, row in heavy.head(3).iterrows()))